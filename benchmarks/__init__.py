@@ -0,0 +1 @@
+"""Offline benchmarks for the Eleven Energy integration."""
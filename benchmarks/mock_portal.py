@@ -0,0 +1,336 @@
+"""A local stand-in for the Eleven Energy portal API.
+
+Serves /site, /devices/{id}, /devices/{id}/operatingMode and a websocket /stream
+of device snapshots with configurable
+latency, error rates, rate limiting, refresh cadence and device counts so the integration can be
+exercised without network access. Run standalone with
+
+    python -m benchmarks.mock_portal --devices 3 --latency 0.2
+"""
+
+import argparse
+import asyncio
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+import hashlib
+import json
+import random
+import time
+
+from aiohttp import web
+
+API_PREFIX = "/api/v1/"
+
+
+@dataclass
+class PortalConfig:
+    """Behaviour of the mock portal."""
+
+    devices: int = 1
+    latency: float = 0.05
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after: int = 1
+    change_every: int = 1
+    refresh_interval: float = 0.0
+    etag: bool = True
+    stream_interval: float = 1.0
+    seed: int | None = None
+
+
+@dataclass
+class MockDevice:
+    """State of one emulated hybrid inverter."""
+
+    device_id: str
+    name: str
+    serial_number: str
+    work_mode: str = "selfConsumption"
+    params: dict = field(default_factory=dict)
+    pv_power: float = 2.5
+    load_power: float = 0.8
+    battery_power: float = -1.2
+    soc: float = 55.0
+    energy: float = 0.0
+    fetches: int = 0
+    sample_time: float = field(default_factory=time.time)
+    payload: bytes = b""
+
+    def advance(self, rng: random.Random, when: float | None = None) -> None:
+        """Random walk the readings to produce a new sample taken at when, default now."""
+        self.pv_power = max(0.0, self.pv_power + rng.uniform(-0.3, 0.3))
+        self.load_power = max(0.1, self.load_power + rng.uniform(-0.2, 0.2))
+        self.battery_power = self.battery_power + rng.uniform(-0.3, 0.3)
+        self.soc = min(100.0, max(0.0, self.soc - self.battery_power / 60))
+        self.energy = self.energy + self.pv_power / 60
+        self.sample_time = when if when is not None else time.time()
+        self.payload = b""
+
+    def render(self) -> bytes:
+        """The device JSON as the portal would return it."""
+        if not self.payload:
+            grid_power = self.load_power - self.pv_power - self.battery_power
+            self.payload = json.dumps(
+                {
+                    "deviceId": self.device_id,
+                    "type": "hybridinverter",
+                    "status": "OnGrid",
+                    "online": True,
+                    "timestamp": datetime.fromtimestamp(
+                        self.sample_time, UTC
+                    ).isoformat(timespec="milliseconds"),
+                    "pv": {
+                        "power": round(self.pv_power, 3),
+                        "energyToday": round(self.energy, 3),
+                    },
+                    "load": {
+                        "power": round(self.load_power, 3),
+                        "energyToday": round(self.energy * 0.7, 3),
+                    },
+                    "battery": {
+                        "power": round(self.battery_power, 3),
+                        "stateOfCharge": round(self.soc),
+                        "energyInToday": round(self.energy * 0.3, 3),
+                        "energyOutToday": round(self.energy * 0.2, 3),
+                    },
+                    "grid": {
+                        "power": round(grid_power, 3),
+                        "energyInToday": round(self.energy * 0.1, 3),
+                        "energyOutToday": round(self.energy * 0.4, 3),
+                    },
+                    "system": {"power": round(self.pv_power, 3), "voltage": 240.1},
+                    "operatingMode": {"workMode": self.work_mode, **self.params},
+                }
+            ).encode()
+        return self.payload
+
+
+class MockPortal:
+    """aiohttp application emulating the portal, with request counters."""
+
+    def __init__(self, config: PortalConfig) -> None:
+        """Create the portal and its devices."""
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.devices = {
+            f"device-{index}": MockDevice(
+                f"device-{index}", f"HI-{index}", f"SN{index:06d}"
+            )
+            for index in range(config.devices)
+        }
+        self.requests = 0
+        self.responses: dict[int, int] = {}
+        self.stream_messages = 0
+        self.runner = None
+        self.app = web.Application(middlewares=[self.middleware])
+        self.app.router.add_get(API_PREFIX + "site", self.handle_site)
+        self.app.router.add_get(API_PREFIX + "stream", self.handle_stream)
+        self.app.router.add_get(API_PREFIX + "devices/{device_id}", self.handle_device)
+        self.app.router.add_post(
+            API_PREFIX + "devices/{device_id}/operatingMode", self.handle_operating_mode
+        )
+
+    @web.middleware
+    async def middleware(self, request: web.Request, handler):
+        """Apply latency and inject failures before handling a request."""
+        if request.path == API_PREFIX + "stream":
+            # the stream is one long lived connection, not a metered request
+            return await handler(request)
+
+        self.requests = self.requests + 1
+        delay = self.config.latency
+        if self.config.jitter:
+            delay = delay + self.rng.uniform(0, self.config.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+
+        roll = self.rng.random()
+        if roll < self.config.rate_limit_rate:
+            response = web.json_response(
+                {"error": "too many requests"},
+                status=429,
+                headers={"Retry-After": str(self.config.retry_after)},
+            )
+        elif roll < self.config.rate_limit_rate + self.config.error_rate:
+            response = web.json_response({"error": "unavailable"}, status=503)
+        else:
+            response = await handler(request)
+
+        self.responses[response.status] = self.responses.get(response.status, 0) + 1
+        return response
+
+    async def handle_site(self, request: web.Request) -> web.Response:
+        """Return the site topology."""
+        return web.json_response(
+            {
+                "siteId": "mock-site",
+                "name": "Mock",
+                "devices": [
+                    {
+                        "deviceId": device.device_id,
+                        "type": "hybridinverter",
+                        "name": device.name,
+                        "serialNumber": device.serial_number,
+                    }
+                    for device in self.devices.values()
+                ],
+            }
+        )
+
+    async def handle_device(self, request: web.Request) -> web.Response:
+        """Return a device sample, advancing it every change_every fetches.
+
+        With a refresh_interval samples are instead taken on that cadence
+        whether or not anyone fetches them, like the real portal.
+        """
+        device = self.devices.get(request.match_info["device_id"])
+        if device is None:
+            return web.json_response({"error": "not found"}, status=404)
+
+        device.fetches = device.fetches + 1
+        if self.config.refresh_interval:
+            interval = self.config.refresh_interval
+            missed = int((time.time() - device.sample_time) // interval)
+            if missed > 0:
+                device.advance(self.rng, device.sample_time + missed * interval)
+        elif (
+            self.config.change_every and device.fetches % self.config.change_every == 0
+        ):
+            device.advance(self.rng)
+
+        body = device.render()
+        headers = {}
+        if self.config.etag:
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            if request.headers.get("If-None-Match") == etag:
+                return web.Response(status=304, headers={"ETag": etag})
+            headers["ETag"] = etag
+
+        return web.Response(body=body, content_type="application/json", headers=headers)
+
+    async def handle_stream(self, request: web.Request) -> web.WebSocketResponse:
+        """Push a fresh sample of every device each stream_interval seconds."""
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+
+        async def push() -> None:
+            try:
+                while not ws.closed:
+                    for device in self.devices.values():
+                        device.advance(self.rng)
+                        await ws.send_bytes(device.render())
+                        self.stream_messages = self.stream_messages + 1
+                    await asyncio.sleep(self.config.stream_interval)
+            except ConnectionResetError:
+                pass
+
+        sender = asyncio.create_task(push())
+        try:
+            # reading is what answers the client's heartbeat pings
+            async for _ in ws:
+                pass
+        finally:
+            sender.cancel()
+        return ws
+
+    async def handle_operating_mode(self, request: web.Request) -> web.Response:
+        """Apply a work mode change."""
+        device = self.devices.get(request.match_info["device_id"])
+        if device is None:
+            return web.json_response({"error": "not found"}, status=404)
+
+        params = await request.json()
+        device.work_mode = params.pop("workMode", device.work_mode)
+        device.params = params
+        device.payload = b""
+        return web.json_response({"result": "ok"})
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving, returns the API base URL."""
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        bound_port = site._server.sockets[0].getsockname()[1]  # noqa: SLF001
+        return f"http://{host}:{bound_port}{API_PREFIX}"
+
+    async def stop(self) -> None:
+        """Stop serving."""
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+
+def add_portal_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the portal behaviour options to a command line parser."""
+    parser.add_argument("--devices", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument(
+        "--change-every",
+        type=int,
+        default=1,
+        help="advance device readings every N fetches, 0 to never change",
+    )
+    parser.add_argument(
+        "--refresh-interval",
+        type=float,
+        default=0.0,
+        help="take a new sample every N seconds instead of per fetch, 0 to disable",
+    )
+    parser.add_argument("--no-etag", dest="etag", action="store_false")
+    parser.add_argument(
+        "--stream-interval",
+        type=float,
+        default=1.0,
+        help="seconds between snapshots pushed on the websocket stream",
+    )
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def portal_config_from_args(args: argparse.Namespace) -> PortalConfig:
+    """Build a portal config from parsed arguments."""
+    return PortalConfig(
+        devices=args.devices,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        change_every=args.change_every,
+        refresh_interval=args.refresh_interval,
+        etag=args.etag,
+        stream_interval=args.stream_interval,
+        seed=args.seed,
+    )
+
+
+async def serve(config: PortalConfig, port: int) -> None:
+    """Run the portal until interrupted."""
+    portal = MockPortal(config)
+    url = await portal.start(port=port)
+    print(f"Mock Eleven Energy portal listening on {url}")  # noqa: T201
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await portal.stop()
+
+
+def main() -> None:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_portal_arguments(parser)
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(portal_config_from_args(args), args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,423 @@
+"""End-to-end benchmarks of the Eleven Energy controller against the mock portal.
+
+Everything runs locally, no portal access is needed. Run from the repository root:
+
+    python -m benchmarks.run_benchmarks --devices 5 --latency 0.2 --cycles 20
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+import time
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.eleven_energy import cadence, command_queue, scheduler
+from custom_components.eleven_energy.api import ElevenEnergyApi
+from custom_components.eleven_energy.budget import RequestBudget
+from custom_components.eleven_energy.controller import Controller
+from custom_components.eleven_energy.scheduler import PollScheduler
+
+from .mock_portal import MockPortal, add_portal_arguments, portal_config_from_args
+
+
+class FreeRunningScheduler(PollScheduler):
+    """The poll scheduler with phase locking turned off, for comparison."""
+
+    def align(self, devices, interval: float) -> float | None:
+        """Never align."""
+        return None
+
+
+class BenchEntry:
+    """The parts of a config entry the controller uses outside of Home Assistant."""
+
+    entry_id = "benchmark"
+    data = {"token": "benchmark"}
+
+    def __init__(self, options: dict) -> None:
+        """Initialise with options."""
+        self.options = options
+
+    def async_create_background_task(self, hass, target, name):
+        """Run background work on the current loop."""
+        return asyncio.get_running_loop().create_task(target, name=name)
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest rank percentile."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarise(values: list[float], scale: float = 1000.0) -> dict:
+    """Summary statistics, scaled to milliseconds by default."""
+    if not values:
+        return {}
+    return {
+        "count": len(values),
+        "mean": round(statistics.fmean(values) * scale, 3),
+        "p50": round(percentile(values, 50) * scale, 3),
+        "p95": round(percentile(values, 95) * scale, 3),
+        "max": round(max(values) * scale, 3),
+    }
+
+
+async def bench_poll_cycles(controller: Controller, cycles: int) -> dict:
+    """Time poll_devices and count state changes per cycle."""
+    latencies = []
+    writes = []
+    failures = 0
+    for _ in range(cycles):
+        before = sum(device.state_writes for device in controller.devices.values())
+        started = time.perf_counter()
+        if not await controller.poll_devices():
+            failures = failures + 1
+        latencies.append(time.perf_counter() - started)
+        writes.append(
+            sum(device.state_writes for device in controller.devices.values()) - before
+        )
+
+    return {
+        "latency_ms": summarise(latencies),
+        "state_writes_per_cycle": round(statistics.fmean(writes), 2) if writes else 0,
+        "failed_cycles": failures,
+        "unchanged_polls": sum(
+            device.polls_unchanged + device.polls_not_modified
+            for device in controller.devices.values()
+        ),
+    }
+
+
+async def bench_update_cpu(
+    controller: Controller, portal: MockPortal, samples: int
+) -> dict:
+    """Measure the CPU cost of HybridInverter.update on a stream of changing payloads."""
+    device = next(iter(controller.devices.values()))
+    mock = portal.devices[device.device_id]
+    payloads = []
+    for _ in range(samples):
+        mock.advance(portal.rng)
+        payloads.append(json.loads(mock.render()))
+
+    cpu = []
+    for payload in payloads:
+        started = time.process_time_ns()
+        await device.update(payload)
+        cpu.append((time.process_time_ns() - started) / 1e9)
+
+    return {"cpu_us": summarise(cpu, scale=1e6)}
+
+
+async def bench_commands(controller: Controller, commands: int) -> dict:
+    """Time from issuing a work mode command until the device reports it."""
+    device_id = next(iter(controller.devices))
+    durations = []
+    outcomes: dict[str, int] = {}
+    modes = ["set_work_mode_pv_export", "set_work_mode_self_consumption"]
+    for index in range(commands):
+        started = time.perf_counter()
+        future = controller.set_work_mode(modes[index % 2], {}, device_id)
+        # poll back to back in place of the fast poll rate so read back is timely
+        while not future.done():
+            await controller.poll_devices()
+        result = future.result()
+        durations.append(time.perf_counter() - started)
+        outcomes[result["status"]] = outcomes.get(result["status"], 0) + 1
+
+    return {"time_to_verify_ms": summarise(durations), "outcomes": outcomes}
+
+
+async def bench_refresh(
+    controller: Controller, api: ElevenEnergyApi, portal: MockPortal, callers: int
+) -> dict:
+    """Burst on-demand refreshes of every device, first with nothing held and then again."""
+    results = {}
+    for name in ("cold", "warm"):
+        if name == "cold":
+            api.responses.clear()
+        requests = portal.requests
+        latencies = []
+
+        async def refresh(device_id: str) -> None:
+            started = time.perf_counter()
+            await controller.refresh_device(device_id)
+            latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(
+            *(
+                refresh(device_id)
+                for device_id in controller.devices
+                for _ in range(callers)
+            )
+        )
+        results[name] = {
+            "latency_ms": summarise(latencies),
+            "portal_requests": portal.requests - requests,
+        }
+    return {"callers_per_device": callers, **results}
+
+
+async def bench_startup(
+    hass: HomeAssistant, entry: BenchEntry, api: ElevenEnergyApi, portal: MockPortal
+) -> dict:
+    """Time initialise with an empty cache and again from the cache of a polled site."""
+    cold = Controller("benchmark", hass, entry, api)
+    await cold.cache.async_remove()
+    started = time.perf_counter()
+    await cold.initialise()
+    cold_time = time.perf_counter() - started
+    await cold.poll_devices()
+    await cold.cache.store.async_save(cold.cache.data)
+    cold.terminate()
+
+    requests = portal.requests
+    warm = Controller("benchmark", hass, entry, api)
+    started = time.perf_counter()
+    await warm.initialise()
+    warm_time = time.perf_counter() - started
+    populated = sum(
+        entity.currentValue is not None
+        for device in warm.devices.values()
+        for entity in device.sensor_entities.values()
+    )
+    warm.terminate()
+
+    return {
+        "cold_ms": round(cold_time * 1000, 3),
+        "cached_ms": round(warm_time * 1000, 3),
+        # requests made before the cached start returned, the site refresh follows later
+        "cached_blocking_requests": portal.requests - requests,
+        "cached_populated_sensors": populated,
+    }
+
+
+async def bench_push(
+    hass: HomeAssistant,
+    api: ElevenEnergyApi,
+    portal: MockPortal,
+    base_url: str,
+    seconds: float,
+) -> dict:
+    """Run the poller with the websocket stream for a while and count what it cost."""
+    entry = BenchEntry(
+        {
+            "push_transport": "websocket",
+            "stream_url": base_url.replace("http://", "ws://") + "stream",
+        }
+    )
+    controller = Controller("benchmark", hass, entry, api)
+    await controller.initialise()
+    requests = portal.requests
+    messages = portal.stream_messages
+    writes = sum(device.state_writes for device in controller.devices.values())
+
+    controller.start_poller()
+    await asyncio.sleep(seconds)
+    controller.terminate()
+
+    return {
+        "seconds": seconds,
+        "snapshots_received": portal.stream_messages - messages,
+        "snapshots_applied": sum(
+            device.pushes for device in controller.devices.values()
+        ),
+        "state_writes": sum(
+            device.state_writes for device in controller.devices.values()
+        )
+        - writes,
+        # only the first poll before the stream connects should hit the portal
+        "portal_requests": portal.requests - requests,
+    }
+
+
+async def bench_phase(
+    hass: HomeAssistant,
+    api: ElevenEnergyApi,
+    portal: MockPortal,
+    seconds: float,
+    refresh: float,
+) -> dict:
+    """Compare how old samples are when fetched, with and without phase locked polling."""
+    # the portal refreshes every refresh seconds and we poll at the same rate, so
+    # scale the second based phase tuning down the same way as the poll interval
+    scale = refresh / 60
+    tuned = [
+        (module, name, getattr(module, name))
+        for module, names in (
+            (
+                cadence,
+                (
+                    "PHASE_MARGIN_SECONDS",
+                    "PHASE_LATE_STEP_SECONDS",
+                    "PHASE_EARLY_STEP_SECONDS",
+                    "PHASE_RETRY_SECONDS",
+                    "PHASE_MIN_PERIOD_SECONDS",
+                ),
+            ),
+            (scheduler, ("PHASE_MIN_DELAY_SECONDS",)),
+        )
+        for name in names
+    ]
+    for module, name, value in tuned:
+        setattr(module, name, value * scale)
+    portal.config.refresh_interval = refresh
+
+    try:
+        results = {}
+        for label, scheduler_class in (
+            ("free_running", FreeRunningScheduler),
+            ("phase_locked", PollScheduler),
+        ):
+            controller = Controller("benchmark", hass, BenchEntry({}), api)
+            await controller.initialise()
+            controller.scheduler = scheduler_class(
+                interval=refresh,
+                fast_interval=refresh / 6,
+                idle_interval=refresh * 3,
+            )
+            ages = []
+            for device in controller.devices.values():
+                record_sample = device.cadence.record_sample
+
+                def timed(sampled, seen_at, record_sample=record_sample):
+                    new = record_sample(sampled, seen_at)
+                    if new and sampled is not None:
+                        ages.append(seen_at - sampled)
+                    return new
+
+                device.cadence.record_sample = timed
+
+            requests = portal.requests
+            controller.start_poller()
+            await asyncio.sleep(seconds)
+            controller.terminate()
+            # the first few samples are needed to learn the cadence
+            settled = ages[len(ages) // 3 :]
+            results[label] = {
+                "sample_age_ms": summarise(settled),
+                "requests": portal.requests - requests,
+                "new_samples": len(ages),
+            }
+    finally:
+        # put the real tuning back for whatever runs next
+        for module, name, value in tuned:
+            setattr(module, name, value)
+        portal.config.refresh_interval = 0.0
+    return results
+
+
+async def run(args: argparse.Namespace) -> dict:
+    """Start the portal, run each benchmark and collect the results."""
+    # keep retries proportionate to the mock latency rather than real world seconds
+    command_queue.COMMAND_BACKOFF_BASE_SECONDS = args.backoff_base
+    command_queue.COMMAND_BACKOFF_MAX_SECONDS = args.backoff_base * 32
+
+    portal = MockPortal(portal_config_from_args(args))
+    base_url = await portal.start()
+    api = ElevenEnergyApi(
+        base_url, budget=RequestBudget(per_minute=args.budget, burst=args.budget)
+    )
+    # the controller keeps its cache in Home Assistant storage, so give it a throwaway config dir
+    config_dir = tempfile.TemporaryDirectory()
+    hass = HomeAssistant(config_dir.name)
+    entry = BenchEntry(
+        {
+            "max_concurrent_requests": args.concurrency,
+            "diagnostic_metrics": args.metrics,
+        }
+    )
+    controller = Controller("benchmark", hass, entry, api)
+
+    try:
+        # discover the site without injected failures so every run has its devices
+        error_rate, rate_limit_rate = (
+            portal.config.error_rate,
+            portal.config.rate_limit_rate,
+        )
+        portal.config.error_rate = portal.config.rate_limit_rate = 0.0
+        startup = await bench_startup(hass, entry, api, portal)
+        await controller.cache.async_remove()
+        await controller.initialise()
+        portal.config.error_rate, portal.config.rate_limit_rate = (
+            error_rate,
+            rate_limit_rate,
+        )
+        results = {
+            "devices": len(controller.devices),
+            "startup": startup,
+            "poll": await bench_poll_cycles(controller, args.cycles),
+            "update": await bench_update_cpu(controller, portal, args.samples),
+            "commands": await bench_commands(controller, args.commands),
+            "refresh": await bench_refresh(
+                controller, api, portal, args.refresh_callers
+            ),
+            "push": await bench_push(hass, api, portal, base_url, args.stream_seconds)
+            if args.stream_seconds
+            else None,
+            "phase": await bench_phase(
+                hass, api, portal, args.phase_seconds, args.phase_refresh
+            )
+            if args.phase_seconds
+            else None,
+            "metrics": controller.metrics.as_dict(),
+            "budget": api.budget.as_dict(),
+            "portal": {
+                "requests": portal.requests,
+                "responses": {str(k): v for k, v in sorted(portal.responses.items())},
+            },
+        }
+    finally:
+        controller.terminate()
+        await api.close()
+        await portal.stop()
+        await hass.async_stop(force=True)
+        config_dir.cleanup()
+
+    return results
+
+
+def main() -> None:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_portal_arguments(parser)
+    parser.add_argument("--cycles", type=int, default=10)
+    parser.add_argument("--samples", type=int, default=1000)
+    parser.add_argument("--commands", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--refresh-callers", type=int, default=10)
+    parser.add_argument("--budget", type=float, default=100000)
+    parser.add_argument("--backoff-base", type=float, default=0.05)
+    parser.add_argument(
+        "--stream-seconds",
+        type=float,
+        default=3.0,
+        help="how long to run against the websocket stream, 0 to skip",
+    )
+    parser.add_argument(
+        "--phase-seconds",
+        type=float,
+        default=10.0,
+        help="how long to poll for each phase locking run, 0 to skip",
+    )
+    parser.add_argument(
+        "--phase-refresh",
+        type=float,
+        default=1.0,
+        help="portal refresh interval during the phase locking runs",
+    )
+    parser.add_argument(
+        "--metrics", action="store_true", help="enable and report controller metrics"
+    )
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
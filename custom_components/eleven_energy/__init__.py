@@ -2,15 +2,26 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
 
+from aiohttp import ClientError
 import voluptuous as vol
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant, ServiceCall, SupportsResponse
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+)
+from homeassistant.exceptions import ConfigEntryNotReady, ServiceValidationError
 
+from .api import async_get_api
+from .cache import SiteCache
 from .const import DOMAIN, PLATFORMS
 from .controller import Controller
+from .targets import async_get_target_index, has_targets
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -29,75 +40,214 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up Eleven Energy from a config entry."""
 
     hass.data.setdefault(DOMAIN, {})
+    hass.data[DOMAIN].setdefault("controllers", {})
 
-    if DOMAIN not in hass.data:
-        hass.data[DOMAIN] = {}
-        hass.data[DOMAIN]["entities"] = []
     _LOGGER.info("*** STARTUP***")
 
-    controller = Controller(entry.data["token"], hass, entry)
-    hass.data[DOMAIN]["controller"] = controller
-    await controller.initialise()
+    # every site shares one connection pool and request budget so together
+    # they stay within the portal limits
+    controller = Controller(entry.data["token"], hass, entry, async_get_api(hass))
+    try:
+        await controller.initialise()
+    except (ClientError, TimeoutError) as err:
+        # nothing cached and the portal can't be reached, let Home Assistant retry
+        raise ConfigEntryNotReady(
+            f"Unable to reach the Eleven Energy portal: {err}"
+        ) from err
+    hass.data[DOMAIN]["controllers"][entry.entry_id] = controller
+    async_get_target_index(hass)
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+
     return True
 
 
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload when the token or options change."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
 def setup(hass: HomeAssistant, entry: ConfigEntry):
     """Set up is called when Home Assistant is loading our component."""
 
-    async def handle_set_workmode(call: ServiceCall):
-        controller = hass.data[DOMAIN]["controller"]
-        await controller.set_work_mode(call.service, call.data)
+    def find_targets(call: ServiceCall) -> list[tuple[Controller, str]]:
+        # each target is routed to whichever site owns it
+        controllers = hass.data.get(DOMAIN, {}).get("controllers", {}).values()
+        if has_targets(call.data):
+            device_ids = async_get_target_index(hass).resolve(call.data)
+        else:
+            # without a target only an unambiguous choice will do
+            device_ids = [
+                device.device_id
+                for controller in controllers
+                for device in controller.devices.values()
+                if device.type == "hybridinverter"
+            ]
+            if len(device_ids) > 1:
+                raise ServiceValidationError(
+                    "Choose which Eleven Energy inverters this call is for"
+                )
+        targets = [
+            (controller, device_id)
+            for device_id in device_ids
+            for controller in controllers
+            if device_id in controller.devices
+        ]
+        if not targets:
+            raise ServiceValidationError(
+                "No Eleven Energy inverter found for this call"
+            )
+        return targets
+
+    async def handle_set_workmode(call: ServiceCall) -> ServiceResponse:
+        outcomes = {}
+        for controller, device_id in find_targets(call):
+            outcome = controller.set_work_mode(call.service, call.data, device_id)
+            if outcome is not None:
+                outcomes[device_id] = outcome
+
+        # return straight away unless the caller wants to know how it went
+        if not call.return_response:
+            return None
+
+        # every device's command runs on its own queue, so they proceed side by side
+        results = dict(zip(outcomes, await asyncio.gather(*outcomes.values())))
+        statuses = {result["status"] for result in results.values()}
+        return {
+            "status": statuses.pop() if len(statuses) == 1 else "mixed",
+            "results": results,
+        }
 
     hass.services.register(
         DOMAIN,
         "set_work_mode_self_consumption",
         handle_set_workmode,
-        supports_response=SupportsResponse.NONE,
+        supports_response=SupportsResponse.OPTIONAL,
     )
 
     hass.services.register(
         DOMAIN,
         "set_work_mode_force_charge",
         handle_set_workmode,
-        supports_response=SupportsResponse.NONE,
+        supports_response=SupportsResponse.OPTIONAL,
     )
 
     hass.services.register(
         DOMAIN,
         "set_work_mode_grid_export",
         handle_set_workmode,
-        supports_response=SupportsResponse.NONE,
+        supports_response=SupportsResponse.OPTIONAL,
     )
 
     hass.services.register(
         DOMAIN,
         "set_work_mode_idle_battery",
         handle_set_workmode,
-        supports_response=SupportsResponse.NONE,
+        supports_response=SupportsResponse.OPTIONAL,
     )
 
     hass.services.register(
         DOMAIN,
         "set_work_mode_pv_export",
         handle_set_workmode,
-        supports_response=SupportsResponse.NONE,
+        supports_response=SupportsResponse.OPTIONAL,
     )
 
     hass.services.register(
         DOMAIN,
         "set_work_mode_target_soc",
         handle_set_workmode,
-        supports_response=SupportsResponse.NONE,
+        supports_response=SupportsResponse.OPTIONAL,
     )
 
     hass.services.register(
         DOMAIN,
         "set_work_mode_reset",
         handle_set_workmode,
-        supports_response=SupportsResponse.NONE,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    def find_device(call: ServiceCall) -> tuple[Controller, str]:
+        targets = find_targets(call)
+        if len(targets) > 1:
+            raise ServiceValidationError("This call is for one Eleven Energy inverter")
+        return targets[0]
+
+    async def handle_get_statistics(call: ServiceCall) -> ServiceResponse:
+        # answered from the rolling window kept in memory, the recorder isn't touched
+        controller, device_id = find_device(call)
+        return controller.get_statistics(device_id, call.data.get("field"))
+
+    hass.services.register(
+        DOMAIN,
+        "get_statistics",
+        handle_get_statistics,
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    async def handle_get_device_snapshot(call: ServiceCall) -> ServiceResponse:
+        # served from the payloads already held, the portal is only asked on refresh
+        targets = find_targets(call)
+        refreshed = {}
+        if call.data.get("refresh", False):
+            refreshed = dict(
+                zip(
+                    (device_id for _, device_id in targets),
+                    await asyncio.gather(
+                        *(
+                            controller.refresh_device(device_id)
+                            for controller, device_id in targets
+                        )
+                    ),
+                )
+            )
+        devices = {}
+        for controller, device_id in targets:
+            devices[device_id] = controller.get_snapshot(device_id)
+            if device_id in refreshed:
+                devices[device_id]["refreshed"] = refreshed[device_id]
+        return {"devices": devices}
+
+    hass.services.register(
+        DOMAIN,
+        "get_device_snapshot",
+        handle_get_device_snapshot,
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    async def handle_set_day_plan(call: ServiceCall) -> ServiceResponse:
+        controller, device_id = find_device(call)
+        try:
+            result = controller.set_day_plan(
+                device_id,
+                {
+                    "windows": call.data.get("windows", []),
+                    "default": call.data.get("default", "self_consumption"),
+                },
+            )
+        except (ValueError, KeyError, TypeError) as err:
+            raise ServiceValidationError(f"Invalid day plan: {err}") from err
+        return result if call.return_response else None
+
+    async def handle_clear_day_plan(call: ServiceCall) -> ServiceResponse:
+        controller, device_id = find_device(call)
+        result = controller.clear_day_plan(device_id)
+        return result if call.return_response else None
+
+    hass.services.register(
+        DOMAIN,
+        "set_day_plan",
+        handle_set_day_plan,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    hass.services.register(
+        DOMAIN,
+        "clear_day_plan",
+        handle_clear_day_plan,
+        supports_response=SupportsResponse.OPTIONAL,
     )
 
     _LOGGER.info("Registered Eleven Energy services")
@@ -108,12 +258,18 @@ def setup(hass: HomeAssistant, entry: ConfigEntry):
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
 
-    if hass.data[DOMAIN]["controller"] is not None:
-        hass.data[DOMAIN]["controller"].terminate()
+    controller = hass.data[DOMAIN]["controllers"].pop(entry.entry_id, None)
+    if controller is not None:
+        controller.terminate()
 
     return await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Delete the cached state of a removed entry."""
+    await SiteCache(hass, entry.entry_id).async_remove()
+
+
 async def async_migrate_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Migrate old entry."""
     _LOGGER.debug("Migrating from version %s", entry.version)
@@ -0,0 +1,284 @@
+"""HTTP client for the Eleven Energy portal shared by every site."""
+
+import asyncio
+from dataclasses import dataclass, replace
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+import logging
+import time
+from typing import Any
+
+from aiohttp import ClientError, ClientSession, ClientTimeout, TCPConnector
+from multidict import CIMultiDictProxy
+
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.util.json import json_loads
+
+from .breaker import CircuitBreaker
+from .budget import RequestBudget
+from .const import (
+    API_CONNECT_TIMEOUT_SECONDS,
+    API_CONNECTION_LIMIT,
+    API_DNS_CACHE_SECONDS,
+    API_KEEPALIVE_SECONDS,
+    API_READ_TIMEOUT_SECONDS,
+    API_TOTAL_TIMEOUT_SECONDS,
+    BASE_URL,
+    DOMAIN,
+    REQUEST_PRIORITY_POLL,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def auth_headers(token: str) -> dict[str, str]:
+    """Build the request headers for an API token."""
+    return {
+        "accept": "application/json",
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json",
+    }
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Convert a Retry-After header, either seconds or an HTTP date, to seconds."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=UTC)
+    return max(0.0, (when - datetime.now(UTC)).total_seconds())
+
+
+@dataclass
+class ApiResponse:
+    """A fully read portal response, the connection has already been released."""
+
+    status: int
+    headers: CIMultiDictProxy[str]
+    body: bytes
+    elapsed: float
+    shared: bool = False
+
+    def json(self) -> Any:
+        """Decode the body."""
+        return json_loads(self.body)
+
+    @property
+    def retry_after(self) -> float | None:
+        """Seconds the portal asked us to wait, if it did."""
+        return parse_retry_after(self.headers.get("Retry-After"))
+
+
+def answer(response: ApiResponse, etag: str | None, shared: bool) -> ApiResponse:
+    """A response as seen by one caller, a 304 if it already has this version."""
+    if (
+        etag is not None
+        and response.status == 200
+        and response.headers.get("ETag") == etag
+    ):
+        return replace(response, status=304, body=b"", shared=shared)
+    if shared:
+        return replace(response, shared=True)
+    return response
+
+
+class ElevenEnergyApi:
+    """Owns a tuned connection pool to the portal, the shared request budget and circuit breaker.
+
+    Every request reads its body in full inside the response context so the
+    connection always goes back to the pool, even on errors. While the breaker
+    is open requests fail straight away with CircuitOpenError, a ClientError,
+    without spending any budget.
+
+    Concurrent GETs of the same resource share one request, and the last good
+    response to each is kept so a caller that allows it can be answered from
+    memory. Requests to the portal are made conditional on the ETag of the
+    response held, whichever caller triggered them.
+    """
+
+    def __init__(
+        self,
+        base_url: str = BASE_URL,
+        budget: RequestBudget | None = None,
+        session: ClientSession | None = None,
+    ) -> None:
+        """Initialise the client, creating a session unless one is supplied."""
+        self.base_url = base_url
+        self.budget = budget if budget is not None else RequestBudget()
+        self.breaker = CircuitBreaker()
+        self.fetches: dict[tuple[str, str | None], asyncio.Task] = {}
+        self.responses: dict[tuple[str, str | None], tuple[float, ApiResponse]] = {}
+        self.coalesced = 0
+        self.from_memory = 0
+        self.owns_session = session is None
+        if session is None:
+            session = ClientSession(
+                connector=TCPConnector(
+                    limit=API_CONNECTION_LIMIT,
+                    ttl_dns_cache=API_DNS_CACHE_SECONDS,
+                    keepalive_timeout=API_KEEPALIVE_SECONDS,
+                ),
+                timeout=ClientTimeout(
+                    total=API_TOTAL_TIMEOUT_SECONDS,
+                    connect=API_CONNECT_TIMEOUT_SECONDS,
+                    sock_read=API_READ_TIMEOUT_SECONDS,
+                ),
+            )
+        self.session = session
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        headers: dict[str, str],
+        json: dict | None = None,
+        priority: int = REQUEST_PRIORITY_POLL,
+    ) -> ApiResponse:
+        """Make a request within the budget, raises ClientError or TimeoutError on failure."""
+        probe = self.breaker.admit()
+        healthy = None
+        try:
+            await self.budget.acquire(priority)
+            started = time.monotonic()
+            async with self.session.request(
+                method, self.base_url + path, headers=headers, json=json
+            ) as response:
+                body = await response.read()
+                result = ApiResponse(
+                    response.status, response.headers, body, time.monotonic() - started
+                )
+        except (ClientError, TimeoutError):
+            healthy = False
+            raise
+        else:
+            # anything short of a server error shows the portal is up
+            healthy = result.status < 500
+        finally:
+            self.breaker.record(healthy, probe)
+        self.budget.observe(result.status, result.retry_after)
+        return result
+
+    async def get(
+        self,
+        path: str,
+        headers: dict[str, str],
+        priority: int = REQUEST_PRIORITY_POLL,
+        max_age: float = 0,
+    ) -> ApiResponse:
+        """GET a portal resource, joining a request for it already in flight.
+
+        A response fetched within max_age seconds is returned without a request.
+        A caller whose If-None-Match is the ETag returned gets a 304 as usual.
+        Responses that didn't come from a request of the caller's own are marked
+        shared.
+        """
+        key = (path, headers.get("Authorization"))
+        etag = headers.get("If-None-Match")
+        held = self.responses.get(key)
+        if held is not None and time.monotonic() - held[0] < max_age:
+            self.from_memory = self.from_memory + 1
+            return answer(held[1], etag, True)
+
+        task = self.fetches.get(key)
+        shared = task is not None
+        if shared:
+            self.coalesced = self.coalesced + 1
+        else:
+            task = asyncio.create_task(self.fetch(key, path, headers, priority))
+            self.fetches[key] = task
+            task.add_done_callback(lambda done: self.fetched(key, done))
+        # a caller giving up mustn't cancel the request for the others
+        return answer(await asyncio.shield(task), etag, shared)
+
+    async def fetch(
+        self,
+        key: tuple[str, str | None],
+        path: str,
+        headers: dict[str, str],
+        priority: int,
+    ) -> ApiResponse:
+        """Make the one request shared by every caller of a GET, keeping a good response."""
+        held = self.responses.get(key)
+        if held is not None:
+            # ask about the version we hold, not whichever one the first caller has
+            headers = {
+                name: value
+                for name, value in headers.items()
+                if name.lower() != "if-none-match"
+            }
+            if etag := held[1].headers.get("ETag"):
+                headers["If-None-Match"] = etag
+        response = await self.request("GET", path, headers, priority=priority)
+        if response.status == 304 and held is not None:
+            response = replace(held[1], elapsed=response.elapsed)
+        if response.status == 200:
+            self.responses[key] = (time.monotonic(), response)
+        return response
+
+    def fetched(self, key: tuple[str, str | None], task: asyncio.Task) -> None:
+        """Forget a finished request, retrieving any error so it is never reported unseen."""
+        if self.fetches.get(key) is task:
+            del self.fetches[key]
+        if not task.cancelled():
+            task.exception()
+
+    def forget(self, path: str) -> None:
+        """Drop the responses held for a resource and those it sits beneath."""
+        for key in [
+            key
+            for key in self.responses
+            if path == key[0] or path.startswith(key[0] + "/")
+        ]:
+            del self.responses[key]
+
+    def as_dict(self) -> dict:
+        """Summarise request sharing for diagnostics."""
+        return {
+            "in_flight": len(self.fetches),
+            "held": len(self.responses),
+            "coalesced": self.coalesced,
+            "from_memory": self.from_memory,
+        }
+
+    async def post(
+        self,
+        path: str,
+        headers: dict[str, str],
+        json: dict,
+        priority: int = REQUEST_PRIORITY_POLL,
+    ) -> ApiResponse:
+        """POST to a portal resource, anything held for the resources above it is out of date."""
+        self.forget(path)
+        return await self.request("POST", path, headers, json, priority)
+
+    async def close(self) -> None:
+        """Abandon shared requests and close the session if we created it."""
+        for task in list(self.fetches.values()):
+            task.cancel()
+        self.responses.clear()
+        if self.owns_session and not self.session.closed:
+            await self.session.close()
+
+
+@callback
+def async_get_api(hass: HomeAssistant) -> ElevenEnergyApi:
+    """Get the integration wide client, creating it on first use."""
+    hass.data.setdefault(DOMAIN, {})
+    if "api" not in hass.data[DOMAIN]:
+        api = ElevenEnergyApi()
+        hass.data[DOMAIN]["api"] = api
+
+        async def close_api(event: Event) -> None:
+            await api.close()
+
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, close_api)
+    return hass.data[DOMAIN]["api"]
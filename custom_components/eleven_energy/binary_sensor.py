@@ -17,9 +17,10 @@ async def async_setup_entry(
     """Set up binary sensor platform."""
 
     # We'll grab all the devices from the controller, then iterate through and register any sensors within each device.
-    controller = hass.data[DOMAIN]["controller"]
+    controller = hass.data[DOMAIN]["controllers"][entry.entry_id]
     for inverter in controller.devices.values():
         async_add_entities(list(inverter.binary_sensor_entities.values()))
 
-    # Finally, call the controller setup completion so it can start updating sensors.
-    controller.complete_platform_setup("binary_sensor")
+    # Finally, call the controller setup completion so it can start updating sensors,
+    # it keeps the callback so devices that join the site later can add their entities.
+    controller.complete_platform_setup("binary_sensor", async_add_entities)
@@ -0,0 +1,115 @@
+"""Circuit breaker stopping requests to the portal while it is down."""
+
+import logging
+import time
+
+from aiohttp import ClientError
+
+from .const import (
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_MAX_OPEN_SECONDS,
+    BREAKER_OPEN_SECONDS,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class CircuitOpenError(ClientError):
+    """The portal is failing, the request was not attempted."""
+
+
+class CircuitBreaker:
+    """Closed, open or half open around every portal request.
+
+    Closed lets every request through. After failure_threshold consecutive
+    failures it opens and rejects requests without sending them. Once the
+    open period has passed it is half open and lets a single probe through,
+    success closes it again and failure reopens it for twice as long.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        open_seconds: float = BREAKER_OPEN_SECONDS,
+        max_open_seconds: float = BREAKER_MAX_OPEN_SECONDS,
+    ) -> None:
+        """Initialise the breaker closed."""
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.failures = 0
+        self.trips = 0
+        self.retry_at = 0.0
+        self.probing = False
+        self.opened_at: float | None = None
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        """closed, open or half_open."""
+        if self.failures < self.failure_threshold:
+            return "closed"
+        if time.monotonic() < self.retry_at:
+            return "open"
+        return "half_open"
+
+    def admit(self) -> bool:
+        """Allow a request or raise CircuitOpenError, returns True if the request is the probe."""
+        match self.state:
+            case "closed":
+                return False
+            case "half_open" if not self.probing:
+                self.probing = True
+                return True
+        self.rejected = self.rejected + 1
+        raise CircuitOpenError("Eleven Energy portal is unavailable")
+
+    def record(self, healthy: bool | None, probe: bool) -> None:
+        """Record the outcome of an admitted request, healthy is None if it was abandoned."""
+        if probe:
+            self.probing = False
+        if healthy is None:
+            return
+
+        if healthy:
+            if self.failures >= self.failure_threshold:
+                _LOGGER.warning(
+                    "Eleven Energy portal is responding again after %.0f seconds",
+                    time.monotonic() - self.opened_at,
+                )
+            self.failures = 0
+            self.trips = 0
+            self.opened_at = None
+            return
+
+        self.failures = self.failures + 1
+        if self.failures == self.failure_threshold or probe:
+            self.trips = self.trips + 1
+            open_for = min(
+                self.max_open_seconds, self.open_seconds * 2 ** (self.trips - 1)
+            )
+            self.retry_at = time.monotonic() + open_for
+            if self.opened_at is None:
+                self.opened_at = time.monotonic()
+                _LOGGER.warning(
+                    "Eleven Energy portal has failed %s requests in a row,"
+                    " pausing requests and probing it every so often",
+                    self.failures,
+                )
+            else:
+                _LOGGER.debug(
+                    "Eleven Energy portal probe failed, next probe in %.0f seconds",
+                    open_for,
+                )
+
+    def as_dict(self) -> dict:
+        """Summarise for diagnostics."""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+            "next_probe_in": round(max(0.0, self.retry_at - time.monotonic()), 1)
+            if self.failures >= self.failure_threshold
+            else None,
+        }
@@ -0,0 +1,166 @@
+"""Request budget shared by every Eleven Energy controller."""
+
+import asyncio
+import heapq
+import logging
+import time
+
+from .const import (
+    REQUEST_BUDGET_BURST,
+    REQUEST_BUDGET_MIN_PER_MINUTE,
+    REQUEST_BUDGET_PENALTY_SECONDS,
+    REQUEST_BUDGET_PER_MINUTE,
+    REQUEST_BUDGET_RECOVERY_REQUESTS,
+    REQUEST_PRIORITY_COMMAND,
+    REQUEST_PRIORITY_POLL,
+    REQUEST_PRIORITY_TOPOLOGY,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+PRIORITY_NAMES = {
+    REQUEST_PRIORITY_COMMAND: "command",
+    REQUEST_PRIORITY_POLL: "poll",
+    REQUEST_PRIORITY_TOPOLOGY: "topology",
+}
+
+
+class RequestBudget:
+    """Token bucket keeping the combined request rate of all sites under the portal limits.
+
+    Waiting requests are served in priority order, commands before polls and
+    polls before topology refreshes, and each priority leaves one more token
+    in the bucket than the one above it so a command rarely queues behind a
+    poll cycle. A 429 halves the rate and pauses every request until its
+    Retry-After has passed, then each successful response wins back a share
+    of the configured rate.
+    """
+
+    def __init__(
+        self,
+        per_minute: float = REQUEST_BUDGET_PER_MINUTE,
+        burst: float = REQUEST_BUDGET_BURST,
+    ) -> None:
+        """Initialise the bucket full."""
+        self.base_rate = per_minute / 60
+        self.min_rate = min(self.base_rate, REQUEST_BUDGET_MIN_PER_MINUTE / 60)
+        self.rate = self.base_rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.waiters: list[tuple[int, int, asyncio.Future]] = []
+        self.sequence = 0
+        self.timer: asyncio.TimerHandle | None = None
+        self.granted = {name: 0 for name in PRIORITY_NAMES.values()}
+        self.throttled = 0
+
+    def refill(self) -> None:
+        """Add the tokens earned since the last refill, none are earned while paused."""
+        now = time.monotonic()
+        earning_since = max(self.updated, self.paused_until)
+        if now > earning_since:
+            self.tokens = min(
+                self.capacity, self.tokens + (now - earning_since) * self.rate
+            )
+        self.updated = now
+
+    def reserve(self, priority: int) -> float:
+        """Tokens a request of this priority must leave for the ones above it."""
+        return min(priority, self.capacity - 1)
+
+    async def acquire(self, priority: int = REQUEST_PRIORITY_POLL) -> None:
+        """Wait until a request may be made, higher priorities first then in arrival order."""
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (priority, self.sequence, future))
+        self.sequence = self.sequence + 1
+        self.dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # granted just as the caller gave up, put the token back
+                self.tokens = min(self.capacity, self.tokens + 1)
+                self.dispatch()
+            raise
+
+    def dispatch(self) -> None:
+        """Grant whatever tokens are available and wake again when the next one is due."""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        self.refill()
+        now = time.monotonic()
+
+        while self.waiters:
+            priority, _, future = self.waiters[0]
+            if future.done():
+                # the caller was cancelled while waiting
+                heapq.heappop(self.waiters)
+                continue
+            if now < self.paused_until or self.tokens < 1 + self.reserve(priority):
+                break
+            heapq.heappop(self.waiters)
+            self.tokens = self.tokens - 1
+            name = PRIORITY_NAMES.get(priority, str(priority))
+            self.granted[name] = self.granted.get(name, 0) + 1
+            future.set_result(None)
+
+        if not self.waiters:
+            return
+        priority = self.waiters[0][0]
+        shortfall = max(0.0, 1 + self.reserve(priority) - self.tokens)
+        delay = max(0.0, self.paused_until - now) + shortfall / self.rate
+        _LOGGER.debug("Request budget exhausted, waiting %.1f seconds", delay)
+        self.timer = asyncio.get_running_loop().call_later(delay, self.dispatch)
+
+    def observe(self, status: int, retry_after: float | None) -> None:
+        """Adapt the rate to a portal response, backing off on 429 and recovering otherwise."""
+        self.refill()
+        if status == 429:
+            self.throttled = self.throttled + 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0.0
+            pause = (
+                retry_after
+                if retry_after is not None
+                else REQUEST_BUDGET_PENALTY_SECONDS
+            )
+            self.paused_until = max(self.paused_until, time.monotonic() + pause)
+            _LOGGER.info(
+                "Eleven Energy portal is rate limiting, pausing %.0f seconds then"
+                " allowing %.1f requests a minute",
+                pause,
+                self.rate * 60,
+            )
+            if self.waiters:
+                self.dispatch()
+        elif status < 400 and self.rate < self.base_rate:
+            self.rate = min(
+                self.base_rate,
+                self.rate + self.base_rate / REQUEST_BUDGET_RECOVERY_REQUESTS,
+            )
+
+    @property
+    def remaining(self) -> float:
+        """Tokens currently available."""
+        self.refill()
+        return self.tokens
+
+    def as_dict(self) -> dict:
+        """Summarise for diagnostics."""
+        waiting = {name: 0 for name in PRIORITY_NAMES.values()}
+        for priority, _, future in self.waiters:
+            if not future.done():
+                name = PRIORITY_NAMES.get(priority, str(priority))
+                waiting[name] = waiting.get(name, 0) + 1
+        return {
+            "remaining": round(self.remaining, 2),
+            "capacity": self.capacity,
+            "per_minute": round(self.rate * 60, 1),
+            "configured_per_minute": round(self.base_rate * 60, 1),
+            "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 1),
+            "waiting": waiting,
+            "granted": dict(self.granted),
+            "throttled": self.throttled,
+        }
@@ -0,0 +1,98 @@
+"""Persistent cache of the last known site topology and device payloads."""
+
+import logging
+import time
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import CACHE_SAVE_DELAY_SECONDS, DOMAIN, STORAGE_VERSION
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class SiteCache:
+    """Keeps the last /site response and device payloads in Home Assistant storage.
+
+    Lets entities be created and populated at startup before the portal has answered.
+    A change schedules a write CACHE_SAVE_DELAY_SECONDS later and changes made
+    before it happens share it. The write isn't put off by them, Store's delayed
+    save restarts its timer on every call, so frequent updates would otherwise
+    hold it back until shutdown.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialise the cache for a config entry."""
+        self.store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}"
+        )
+        self.data: dict[str, Any] = {"site": None, "devices": {}, "plans": {}}
+        self.save_due: float | None = None
+
+    async def async_load(self) -> None:
+        """Read the cache from storage, a missing or corrupt cache is treated as empty."""
+        try:
+            stored = await self.store.async_load()
+        except Exception as err:  # pylint: disable=broad-except
+            _LOGGER.warning("Ignoring unreadable Eleven Energy cache: %s", err)
+            stored = None
+        if stored:
+            self.data = {
+                "site": stored.get("site"),
+                "devices": stored.get("devices", {}),
+                "plans": stored.get("plans", {}),
+            }
+
+    @property
+    def site(self) -> dict | None:
+        """The cached /site response."""
+        return self.data["site"]
+
+    def device_payload(self, device_id: str) -> tuple[dict, float] | None:
+        """The cached payload of a device and when it was fetched."""
+        cached = self.data["devices"].get(device_id)
+        if cached is None:
+            return None
+        return cached["payload"], cached["fetched"]
+
+    def set_site(self, site: dict) -> None:
+        """Remember the latest /site response."""
+        self.data["site"] = site
+        self.schedule_save()
+
+    def set_device_payload(self, device_id: str, payload: dict, fetched: float) -> None:
+        """Remember the latest payload of a device."""
+        self.data["devices"][device_id] = {"payload": payload, "fetched": fetched}
+        self.schedule_save()
+
+    @property
+    def plans(self) -> dict[str, dict]:
+        """The day plan of each device that has one."""
+        return self.data["plans"]
+
+    def set_plan(self, device_id: str, plan: dict | None) -> None:
+        """Remember a device's day plan, None to forget it."""
+        if plan is None:
+            self.data["plans"].pop(device_id, None)
+        else:
+            self.data["plans"][device_id] = plan
+        self.schedule_save()
+
+    def remove_device(self, device_id: str) -> None:
+        """Forget a device that has left the site."""
+        removed = self.data["devices"].pop(device_id, None)
+        if self.data["plans"].pop(device_id, None) is not None or removed is not None:
+            self.schedule_save()
+
+    def schedule_save(self) -> None:
+        """Save after a delay unless a save is already due, it writes the data as it is then."""
+        now = time.monotonic()
+        if self.save_due is not None and now < self.save_due:
+            return
+        self.save_due = now + CACHE_SAVE_DELAY_SECONDS
+        self.store.async_delay_save(lambda: self.data, CACHE_SAVE_DELAY_SECONDS)
+
+    async def async_remove(self) -> None:
+        """Delete the stored cache, used when the entry is removed."""
+        await self.store.async_remove()
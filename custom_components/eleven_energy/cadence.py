@@ -0,0 +1,140 @@
+"""Learning when the portal refreshes a device so polls can land just after."""
+
+from collections import deque
+import math
+
+from .const import (
+    PHASE_EARLY_STEP_SECONDS,
+    PHASE_HISTORY,
+    PHASE_LATE_STEP_SECONDS,
+    PHASE_MARGIN_SECONDS,
+    PHASE_MAX_RETRIES,
+    PHASE_MIN_PERIOD_SECONDS,
+    PHASE_MIN_SAMPLES,
+    PHASE_RETRY_SECONDS,
+    PHASE_UNLOCK_PERIODS,
+)
+
+
+class UpstreamCadence:
+    """The refresh period and phase of one device's data on the portal.
+
+    The period is a low quantile of the gaps between distinct samples so an
+    occasional missed refresh doesn't stretch it. The next sample is expected
+    a period after the last one plus an offset covering publication delay and
+    clock skew. A poll that still finds the old sample pushes the offset later,
+    one that finds the new sample first time nudges it earlier, so it settles
+    just after the refresh. Payloads without a timestamp use the time their
+    content was first seen to change instead. Times are wall clock seconds.
+    """
+
+    def __init__(self) -> None:
+        """Start unlocked, nothing is known until a few samples have arrived."""
+        self.last_sample: float | None = None
+        self.last_new_at: float | None = None
+        self.gaps: deque[float] = deque(maxlen=PHASE_HISTORY)
+        self.offset = float(PHASE_MARGIN_SECONDS)
+        self.retries = 0
+        self.adjusted = False
+        self.duplicates = 0
+
+    @property
+    def period(self) -> float | None:
+        """Seconds between portal refreshes, None until enough gaps have been seen."""
+        if len(self.gaps) < PHASE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.gaps)
+        return ordered[len(ordered) // 4]
+
+    def locked(self, now: float) -> bool:
+        """Determine if the cadence is known and the device is still following it."""
+        period = self.period
+        return (
+            period is not None
+            and now - self.last_new_at < PHASE_UNLOCK_PERIODS * period
+        )
+
+    def expected(self) -> float | None:
+        """When the sample after the last one should be available."""
+        period = self.period
+        if period is None:
+            return None
+        return self.last_sample + period + self.offset
+
+    def due(self, now: float) -> bool:
+        """Determine if a poll now could find a new sample."""
+        if not self.locked(now):
+            return True
+        return now >= self.expected() - PHASE_MARGIN_SECONDS
+
+    def next_fetch(self, now: float, earliest: float) -> float | None:
+        """When to poll next for a new sample, no sooner than earliest unless one is late."""
+        if not self.locked(now):
+            return None
+        period = self.period
+        expected = self.expected()
+        if expected <= now and self.retries < PHASE_MAX_RETRIES:
+            # the refresh is late, look again shortly
+            return now + PHASE_RETRY_SECONDS
+        skip = max(0, math.ceil((max(now, earliest) - expected) / period))
+        return expected + skip * period
+
+    def clamp_offset(self) -> None:
+        """Keep the offset within half a period either side."""
+        period = self.period
+        if period is not None:
+            self.offset = min(period / 2, max(-period / 2, self.offset))
+
+    def record_unchanged(self, seen_at: float) -> None:
+        """A poll found the sample we already have."""
+        expected = self.expected()
+        if expected is None or seen_at < expected:
+            return
+        # polled when the new sample should have been there, it must come out later
+        if not self.adjusted:
+            self.offset = self.offset + PHASE_LATE_STEP_SECONDS
+            self.clamp_offset()
+            self.adjusted = True
+        self.retries = self.retries + 1
+
+    def record_sample(self, sampled: float | None, seen_at: float) -> bool:
+        """Learn from a changed payload, returns False if its timestamp has already been processed."""
+        if sampled is None:
+            sampled = seen_at
+        elif self.last_sample is not None and sampled <= self.last_sample:
+            self.duplicates = self.duplicates + 1
+            self.record_unchanged(seen_at)
+            return False
+
+        expected = self.expected()
+        if expected is not None:
+            if seen_at < expected:
+                # it was out before we expected it
+                self.offset = min(self.offset, seen_at - sampled + PHASE_MARGIN_SECONDS)
+            elif not self.retries:
+                # found first time, try a little earlier next time
+                self.offset = self.offset - PHASE_EARLY_STEP_SECONDS
+            self.clamp_offset()
+
+        if self.last_sample is not None:
+            gap = sampled - self.last_sample
+            if gap >= PHASE_MIN_PERIOD_SECONDS:
+                self.gaps.append(gap)
+        self.last_sample = sampled
+        self.last_new_at = seen_at
+        self.retries = 0
+        self.adjusted = False
+        return True
+
+    def as_dict(self, now: float) -> dict:
+        """Summarise for diagnostics."""
+        period = self.period
+        return {
+            "locked": self.locked(now),
+            "period": round(period, 1) if period is not None else None,
+            "offset": round(self.offset, 2),
+            "next_expected_in": round(self.expected() - now, 1)
+            if period is not None
+            else None,
+            "duplicates_dropped": self.duplicates,
+        }
@@ -0,0 +1,329 @@
+"""Per-device queue for work mode commands."""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+import logging
+import random
+import time
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import (
+    COMMAND_BACKOFF_BASE_SECONDS,
+    COMMAND_BACKOFF_MAX_SECONDS,
+    COMMAND_MAX_ATTEMPTS,
+    COMMAND_MAX_REASSERTS,
+    COMMAND_VERIFY_SECONDS,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def values_match(wanted, reported) -> bool:
+    """Compare a requested parameter with the reported one, numbers by value."""
+    if isinstance(wanted, str) and isinstance(reported, str):
+        return wanted.lower() == reported.lower()
+    if isinstance(wanted, bool) or isinstance(reported, bool):
+        return wanted == reported
+    if isinstance(wanted, (int, float)) and isinstance(reported, (int, float)):
+        return abs(wanted - reported) < 1e-6
+    return wanted == reported
+
+
+class WorkModeCommand:
+    """A single request to change the work mode of a device."""
+
+    def __init__(self, device_id: str, params: dict) -> None:
+        """Create a command."""
+        self.device_id = device_id
+        self.params = params
+        self.created = time.monotonic()
+        self.attempts = 0
+        self.accepted: float | None = None
+        self.reasserts = 0
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    @property
+    def verifiable(self) -> bool:
+        """Determine if the device will report this command once it takes effect.
+
+        Reset hands control back to the portal's schedule, so the device goes on
+        to report whichever mode that picks rather than reset itself.
+        """
+        return self.params.get("workMode") != "reset"
+
+    def matches(self, operating_mode: dict) -> bool:
+        """Determine if a reported operatingMode shows this command, parameters it omits are ignored."""
+        return (
+            self.verifiable
+            and "workMode" in operating_mode
+            and all(
+                values_match(value, operating_mode[key])
+                for key, value in self.params.items()
+                if key in operating_mode
+            )
+        )
+
+    def finish(self, status: str, http_status: int | None = None) -> None:
+        """Complete the command, resolving anyone waiting on it."""
+        if self.future.done():
+            return
+        self.future.set_result(
+            {
+                "device_id": self.device_id,
+                "work_mode": self.params.get("workMode"),
+                "status": status,
+                "http_status": http_status,
+                "attempts": self.attempts,
+                "reasserts": self.reasserts,
+                "duration": round(time.monotonic() - self.created, 3),
+            }
+        )
+
+
+class CommandQueue:
+    """Sends work mode commands for one device, a newer command supersedes a pending one.
+
+    Only the most recent command is kept. If a command is waiting to retry when a
+    newer one arrives, the old one is abandoned and the new one is sent straight away,
+    so a stale mode can never land after the one the user asked for last.
+
+    A command the portal accepts isn't finished until the device reports it in
+    operatingMode. If that hasn't happened within COMMAND_VERIFY_SECONDS the command
+    is sent again, up to COMMAND_MAX_REASSERTS times, before it is given up as
+    unverified.
+
+    Unless forced, a command the device is already carrying out is not sent at all.
+    It finishes straight away as unchanged, or shares the outcome of the identical
+    command already in flight.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        device_id: str,
+        send: Callable[[str, dict], Awaitable[tuple[int | None, float | None]]],
+        on_retry: Callable[[], None] | None = None,
+        on_finish: Callable[[dict], None] | None = None,
+    ) -> None:
+        """Initialise the queue, send performs one attempt and returns (status, retry_after).
+
+        on_finish is called with the outcome of every command that reached the portal.
+        """
+        self.hass = hass
+        self.entry = entry
+        self.device_id = device_id
+        self.send = send
+        self.on_retry = on_retry
+        self.on_finish = on_finish
+        self.pending: WorkModeCommand | None = None
+        self.verifying: WorkModeCommand | None = None
+        self.observed = None
+        self.acknowledged: dict | None = None
+        self.wakeup = asyncio.Event()
+        self.task = None
+
+    def submit(self, params: dict, force: bool = False) -> asyncio.Future:
+        """Queue a command, returning a future resolved when it completes."""
+        command = WorkModeCommand(self.device_id, params)
+
+        if not force:
+            in_flight = self.pending or self.verifying
+            if in_flight is not None and in_flight.params == params:
+                self.skip(command)
+                return in_flight.future
+            if in_flight is None and self.already_applied(params):
+                self.skip(command)
+                return command.future
+
+        if self.pending is not None:
+            _LOGGER.debug(
+                "Work mode %s for %s superseded by %s",
+                self.pending.params.get("workMode"),
+                self.device_id,
+                params.get("workMode"),
+            )
+            self.pending.finish("superseded")
+        if self.verifying is not None:
+            self.verifying.finish("superseded")
+            self.verifying = None
+
+        self.pending = command
+        self.wakeup.set()
+        self.ensure_running()
+
+        return command.future
+
+    def already_applied(self, params: dict) -> bool:
+        """Determine if the device is known to be in this mode with these parameters.
+
+        Parameters the device reports are compared with what it last reported,
+        any others with the last command it acknowledged, so a parameter it
+        doesn't report is only taken as set if we set it. A call that leaves out
+        a parameter the device has a value for may be asking for the portal's
+        default, so it is always sent.
+        """
+        if params.get("workMode") == "reset":
+            # hands control back to the portal's own schedule, always worth sending
+            return False
+        observed = self.observed
+        if not isinstance(observed, dict) or "workMode" not in observed:
+            observed = {}
+        acknowledged = self.acknowledged or {}
+        unreported = {key for key in acknowledged if key not in observed}
+        if not observed and not acknowledged:
+            return False
+        if not unreported.issubset(params) or not set(observed).issubset(params):
+            # something set before would be left to the portal's default
+            return False
+        for key, value in params.items():
+            if key in observed:
+                if not values_match(value, observed[key]):
+                    return False
+            elif key not in acknowledged or not values_match(value, acknowledged[key]):
+                return False
+        return True
+
+    def skip(self, command: WorkModeCommand) -> None:
+        """Finish a command that needn't be sent and report it."""
+        _LOGGER.debug(
+            "Work mode %s for %s is already in place, not sending it",
+            command.params.get("workMode"),
+            self.device_id,
+        )
+        command.finish("unchanged")
+        if self.on_finish is not None:
+            self.on_finish(command.future.result())
+
+    def ensure_running(self) -> None:
+        """Start the sending task if it isn't already running."""
+        if self.task is None or self.task.done():
+            self.task = self.entry.async_create_background_task(
+                self.hass, self.run(), f"Eleven Energy commands {self.device_id}"
+            )
+
+    def backoff_delay(self, attempts: int, retry_after: float | None) -> float:
+        """Jittered exponential backoff, never shorter than the server asked for."""
+        ceiling = min(
+            COMMAND_BACKOFF_MAX_SECONDS, COMMAND_BACKOFF_BASE_SECONDS * (2**attempts)
+        )
+        delay = random.uniform(ceiling / 2, ceiling)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    async def run(self) -> None:
+        """Work through commands until nothing is pending."""
+        while (command := self.pending) is not None:
+            self.wakeup.clear()
+            command.attempts = command.attempts + 1
+            status, retry_after = await self.send(self.device_id, command.params)
+
+            if self.pending is not command:
+                # superseded while in flight, the newer command goes next
+                continue
+
+            if status == 200 and not command.verifiable:
+                # nothing will show it took effect, accepted is as good as it gets
+                self.pending = None
+                self.complete(command, "applied", status)
+                continue
+
+            if status == 200:
+                # accepted, now wait for the device to show it
+                self.pending = None
+                command.accepted = time.monotonic()
+                self.verifying = command
+                continue
+
+            if command.attempts >= COMMAND_MAX_ATTEMPTS:
+                _LOGGER.warning(
+                    "Unable to change work mode of %s after %s attempts, last status %s",
+                    self.device_id,
+                    command.attempts,
+                    status,
+                )
+                self.pending = None
+                self.complete(command, "failed", status)
+                continue
+
+            delay = self.backoff_delay(command.attempts, retry_after)
+            _LOGGER.info(
+                "Set workmode got status %s, retrying in %.1f seconds", status, delay
+            )
+            if self.on_retry is not None:
+                self.on_retry()
+            try:
+                # a newer command wakes us early
+                await asyncio.wait_for(self.wakeup.wait(), delay)
+            except TimeoutError:
+                pass
+
+    def observe(self, operating_mode) -> None:
+        """Check a command awaiting verification against the operatingMode just reported."""
+        self.observed = operating_mode
+        command = self.verifying
+        if command is None:
+            return
+
+        if not isinstance(operating_mode, dict):
+            # the device doesn't report its mode, accepted is as good as it gets
+            self.verifying = None
+            self.complete(command, "applied", 200)
+            return
+
+        if command.matches(operating_mode):
+            self.verifying = None
+            self.complete(command, "verified", 200)
+            return
+
+        if time.monotonic() - command.accepted < COMMAND_VERIFY_SECONDS:
+            return
+
+        self.verifying = None
+        if command.reasserts >= COMMAND_MAX_REASSERTS:
+            _LOGGER.warning(
+                "%s accepted work mode %s but still reports %s",
+                self.device_id,
+                command.params.get("workMode"),
+                operating_mode.get("workMode"),
+            )
+            self.complete(command, "unverified", 200)
+            return
+
+        _LOGGER.info(
+            "%s hasn't switched to work mode %s, sending it again",
+            self.device_id,
+            command.params.get("workMode"),
+        )
+        command.reasserts = command.reasserts + 1
+        if self.pending is None:
+            self.pending = command
+            self.wakeup.set()
+            self.ensure_running()
+
+    def complete(self, command: WorkModeCommand, status: str, http_status: int) -> None:
+        """Finish a command that reached the portal and report the outcome."""
+        command.finish(status, http_status)
+        # only a command the device took on tells us what it is doing
+        self.acknowledged = (
+            command.params
+            if status in ("verified", "applied") and command.verifiable
+            else None
+        )
+        if self.on_finish is not None and command.future.done():
+            self.on_finish(command.future.result())
+
+    def cancel(self) -> None:
+        """Stop processing and abandon anything pending."""
+        if self.pending is not None:
+            self.pending.finish("cancelled")
+            self.pending = None
+        if self.verifying is not None:
+            self.verifying.finish("cancelled")
+            self.verifying = None
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
@@ -2,19 +2,29 @@
 
 from __future__ import annotations
 
+import hashlib
 import logging
 from typing import Any
 
-from aiohttp import ClientSession
+from aiohttp import ClientError
 import voluptuous as vol
 
 from homeassistant import config_entries
+from homeassistant.components import webhook
 from homeassistant.config_entries import ConfigEntry, OptionsFlow
 from homeassistant.core import HomeAssistant
 from homeassistant.data_entry_flow import FlowResult
 from homeassistant.exceptions import HomeAssistantError
 
-from .const import BASE_URL, DOMAIN
+from .api import ElevenEnergyApi, async_get_api, auth_headers
+from .const import (
+    API_CONNECTION_LIMIT,
+    DOMAIN,
+    MAX_CONCURRENT_REQUESTS,
+    PUSH_TRANSPORTS,
+    REQUEST_PRIORITY_COMMAND,
+    STALE_AFTER_MINUTES,
+)
 
 _LOGGER = logging.getLogger(__name__)
 STEP_USER_DATA_SCHEMA = vol.Schema(
@@ -30,24 +40,26 @@ class TokenChecker:
     TODO Remove this placeholder class and replace with things from your PyPI package.
     """
 
-    def __init__(self, token: str) -> None:
+    def __init__(self, api: ElevenEnergyApi, token: str) -> None:
         """Initialize."""
-        self.headers = {
-            "accept": "application/json",
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json",
-        }
+        self.api = api
+        self.headers = auth_headers(token)
+        self.site = {}
 
     async def checkToken(self) -> bool:
         """Test we can access the configured host."""
         try:
-            async with ClientSession().get(
-                BASE_URL + "site", headers=self.headers
-            ) as resp:
-                _LOGGER.error("Got response %s of %s", resp.url, resp.status)
-                return resp.status == 200
-        except:  # noqa: E722
+            # someone is waiting on the form, so go ahead of any polling
+            resp = await self.api.get("site", self.headers, REQUEST_PRIORITY_COMMAND)
+        except (ClientError, TimeoutError) as err:
+            _LOGGER.error("Unable to reach Eleven Energy: %s", err)
+            return False
+
+        _LOGGER.debug("Got site response %s", resp.status)
+        if resp.status != 200:
             return False
+        self.site = resp.json()
+        return True
 
 
 async def validate_input(hass: HomeAssistant, data: dict[str, Any]) -> dict[str, Any]:
@@ -56,13 +68,23 @@ async def validate_input(hass: HomeAssistant, data: dict[str, Any]) -> dict[str,
     Data has the keys from STEP_USER_DATA_SCHEMA with values provided by the user.
     """
 
-    hub = TokenChecker(data["token"])
+    hub = TokenChecker(async_get_api(hass), data["token"])
 
     if not await hub.checkToken():
         raise CannotConnect
 
+    # Identify the site so the same one can't be added twice, older portals
+    # may not report a site ID so fall back to a digest of the token.
+    site_id = hub.site.get("siteId") or hub.site.get("id")
+    if site_id is None:
+        site_id = hashlib.sha256(data["token"].encode()).hexdigest()[:16]
+
+    title = "Eleven Energy"
+    if hub.site.get("name"):
+        title = title + " " + hub.site["name"]
+
     # Return info that you want to store in the config entry.
-    return {"title": "Eleven Energy"}
+    return {"title": title, "unique_id": str(site_id)}
 
 
 class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
@@ -73,10 +95,6 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     ) -> FlowResult:
         """Handle the initial step."""
 
-        entries = self.hass.config_entries.async_entries(DOMAIN)
-        if entries:
-            return self.async_abort(reason="already_setup")
-
         errors: dict[str, str] = {}
         if user_input is not None:
             try:
@@ -89,6 +107,8 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 _LOGGER.exception("Unexpected exception")
                 errors["base"] = "unknown"
             else:
+                await self.async_set_unique_id(info["unique_id"])
+                self._abort_if_unique_id_configured()
                 return self.async_create_entry(title=info["title"], data=user_input)
 
         return self.async_show_form(
@@ -133,16 +153,20 @@ class OptionsFlowHandler(OptionsFlow):
                 _LOGGER.exception("Unexpected exception")
                 errors["base"] = "unknown"
             else:
-                # self.config_entry.version = 1
+                # the token belongs in the entry data, everything else is an option
+                options = {**self.config_entry.options, **user_input}
+                token = options.pop("token")
+                if options.get("push_transport") == "webhook" and not options.get(
+                    "webhook_id"
+                ):
+                    options["webhook_id"] = webhook.async_generate_id()
                 self.hass.config_entries.async_update_entry(
                     self.config_entry,
-                    data=user_input,
-                    options=self.config_entry.options,
-                    title="Eleven Energy",
+                    data={**self.config_entry.data, "token": token},
                 )
                 return self.async_create_entry(
-                    title="Eleven Energy",
-                    data=user_input,
+                    title=self.config_entry.title,
+                    data=options,
                 )
 
         return self.async_show_form(
@@ -150,6 +174,42 @@ class OptionsFlowHandler(OptionsFlow):
             data_schema=vol.Schema(
                 {
                     vol.Required("token", default=self.config_entry.data["token"]): str,
+                    vol.Optional(
+                        "diagnostic_metrics",
+                        default=self.config_entry.options.get(
+                            "diagnostic_metrics", False
+                        ),
+                    ): bool,
+                    vol.Optional(
+                        "statistics_sensors",
+                        default=self.config_entry.options.get(
+                            "statistics_sensors", False
+                        ),
+                    ): bool,
+                    vol.Optional(
+                        "stale_after_minutes",
+                        default=self.config_entry.options.get(
+                            "stale_after_minutes", STALE_AFTER_MINUTES
+                        ),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                    vol.Optional(
+                        "max_concurrent_requests",
+                        default=self.config_entry.options.get(
+                            "max_concurrent_requests", MAX_CONCURRENT_REQUESTS
+                        ),
+                    ): vol.All(
+                        vol.Coerce(int),
+                        # more than the pool holds would only queue for a connection
+                        vol.Range(min=1, max=API_CONNECTION_LIMIT),
+                    ),
+                    vol.Optional(
+                        "push_transport",
+                        default=self.config_entry.options.get("push_transport", "none"),
+                    ): vol.In(PUSH_TRANSPORTS),
+                    vol.Optional(
+                        "stream_url",
+                        default=self.config_entry.options.get("stream_url", ""),
+                    ): str,
                 }
             ),
             errors=errors,
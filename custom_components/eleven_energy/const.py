@@ -6,3 +6,70 @@ DOMAIN = "eleven_energy"
 PLATFORMS: list[Platform] = [Platform.BINARY_SENSOR, Platform.SENSOR]
 BASE_URL = "https://portal.elevenenergy.co.uk/api/v1/"
 POLL_INTERVAL_SECONDS = 60
+FAST_POLL_INTERVAL_SECONDS = 10
+FAST_POLL_WINDOW_SECONDS = 120
+IDLE_POLL_INTERVAL_SECONDS = 180
+ERROR_BACKOFF_MAX_SECONDS = 600
+RAPID_POWER_CHANGE_KW = 1.0
+IDLE_POWER_THRESHOLD_KW = 0.05
+MAX_CONCURRENT_REQUESTS = 4
+COMMAND_MAX_ATTEMPTS = 7
+COMMAND_BACKOFF_BASE_SECONDS = 1
+COMMAND_BACKOFF_MAX_SECONDS = 32
+HEARTBEAT_WRITE_SECONDS = 15 * 60
+POWER_DEADBAND_KW = 0.02
+VOLTAGE_DEADBAND_V = 0.5
+REQUEST_BUDGET_PER_MINUTE = 120
+REQUEST_BUDGET_BURST = 10
+REQUEST_BUDGET_MIN_PER_MINUTE = 6
+REQUEST_BUDGET_RECOVERY_REQUESTS = 20
+REQUEST_BUDGET_PENALTY_SECONDS = 30
+REQUEST_PRIORITY_COMMAND = 0
+REQUEST_PRIORITY_POLL = 1
+REQUEST_PRIORITY_TOPOLOGY = 2
+API_CONNECTION_LIMIT = 10
+API_KEEPALIVE_SECONDS = 75
+API_DNS_CACHE_SECONDS = 300
+API_CONNECT_TIMEOUT_SECONDS = 10
+API_READ_TIMEOUT_SECONDS = 20
+API_TOTAL_TIMEOUT_SECONDS = 30
+API_FRESH_SECONDS = 5
+TOPOLOGY_REFRESH_SECONDS = 60 * 60
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_OPEN_SECONDS = 30
+BREAKER_MAX_OPEN_SECONDS = 600
+STALE_AFTER_MINUTES = 10
+STALE_CHECK_SECONDS = 30
+TOPOLOGY_MISSES_BEFORE_REMOVAL = 2
+STORAGE_VERSION = 1
+CACHE_SAVE_DELAY_SECONDS = 60
+STREAM_QUIET_SECONDS = 90
+STREAM_HEARTBEAT_SECONDS = 10
+STREAM_RECONNECT_BASE_SECONDS = 5
+STREAM_RECONNECT_MAX_SECONDS = 300
+PUSH_TRANSPORTS = ["none", "webhook", "websocket"]
+ENERGY_MAX_GAP_SECONDS = 10 * 60
+ENERGY_RESYNC_KWH = 0.25
+PHASE_HISTORY = 8
+PHASE_MIN_SAMPLES = 3
+PHASE_MIN_PERIOD_SECONDS = 5
+PHASE_MARGIN_SECONDS = 2
+PHASE_MIN_DELAY_SECONDS = 1
+PHASE_LATE_STEP_SECONDS = 2
+PHASE_EARLY_STEP_SECONDS = 0.25
+PHASE_RETRY_SECONDS = 5
+PHASE_MAX_RETRIES = 3
+PHASE_UNLOCK_PERIODS = 3
+STATISTICS_WINDOW_SECONDS = 15 * 60
+STATISTICS_CAPACITY = 1024
+PLAN_RETRY_SECONDS = 120
+PLAN_WORK_MODES = {
+    "self_consumption": "selfConsumption",
+    "force_charge": "forceCharge",
+    "grid_export": "gridExport",
+    "pv_export": "pvExportPriority",
+    "idle_battery": "idleBattery",
+    "target_soc": "targetSoc",
+}
+COMMAND_VERIFY_SECONDS = 60
+COMMAND_MAX_REASSERTS = 2
@@ -1,81 +1,173 @@
 """The main Eleven Energy coordinator."""
 
 import asyncio
+import hashlib
 import logging
+import time
 
-from aiohttp import ClientResponse
+from aiohttp import ClientError
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers import device_registry as dr
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
-from homeassistant.helpers.device_registry import DeviceEntry
-
-from .const import BASE_URL, PLATFORMS, POLL_INTERVAL_SECONDS
-from .hybrid_inverter import HybridInverter
+import homeassistant.util.dt as dt_util
+from homeassistant.util.json import json_loads
+
+from .api import ElevenEnergyApi, auth_headers
+from .breaker import CircuitOpenError
+from .cache import SiteCache
+from .command_queue import CommandQueue
+from .const import (
+    API_FRESH_SECONDS,
+    DOMAIN,
+    MAX_CONCURRENT_REQUESTS,
+    PLATFORMS,
+    REQUEST_PRIORITY_COMMAND,
+    REQUEST_PRIORITY_POLL,
+    REQUEST_PRIORITY_TOPOLOGY,
+    STALE_AFTER_MINUTES,
+    STALE_CHECK_SECONDS,
+    STREAM_QUIET_SECONDS,
+    TOPOLOGY_MISSES_BEFORE_REMOVAL,
+    TOPOLOGY_REFRESH_SECONDS,
+)
+from .device import DEVICE_TYPES, ElevenDevice
+from .energy import sample_time
+from .hybrid_inverter import HybridInverter  # noqa: F401 - registers the device type
+from .metrics import Metrics
+from .planner import DayPlan, WorkModePlanner
+from .scheduler import PollScheduler
+from .transport import PushTransport, WebhookTransport, WebSocketTransport
 
 _LOGGER = logging.getLogger(__name__)
 
+# what decoding or applying a device document that isn't what we expect can raise
+PAYLOAD_ERRORS = (ValueError, KeyError, TypeError, AttributeError)
+
+
+def iso_timestamp(timestamp: float | None) -> str | None:
+    """A POSIX timestamp as ISO 8601 in UTC."""
+    if timestamp is None:
+        return None
+    return dt_util.utc_from_timestamp(timestamp).isoformat()
+
 
 class Controller:
     """Controller class orchestrating the data fetching and entitities."""
 
-    def __init__(self, token: str, hass: HomeAssistant, entry: ConfigEntry) -> None:
-        """Initialise the controller."""
+    def __init__(
+        self,
+        token: str,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        api: ElevenEnergyApi,
+    ) -> None:
+        """Initialise the controller, the API client is shared with other sites."""
         self.token = token
+        self.api = api
         self.hass = hass
         self.config = entry
         self.poller_task = None
-        self.headers = {
-            "accept": "application/json",
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json",
-        }
+        self.topology_task = None
+        self.staleness_task = None
+        self.entity_adders = {}
+        self.topology_misses = {}
+        self.unsupported_types = set()
+        self.headers = auth_headers(token)
         self.devices = {}
         self.platforms_started = 0
+        self.max_concurrent_requests = entry.options.get(
+            "max_concurrent_requests", MAX_CONCURRENT_REQUESTS
+        )
+        self.metrics = Metrics(entry.options.get("diagnostic_metrics", False))
+        self.stale_after = (
+            entry.options.get("stale_after_minutes", STALE_AFTER_MINUTES) * 60
+        )
+        self.scheduler = PollScheduler()
+        self.poll_wakeup = asyncio.Event()
+        self.command_queues = {}
+        self.refreshes: dict[str, asyncio.Task] = {}
+        self.refresh_semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+        self.cache = SiteCache(hass, entry.entry_id)
+        self.transport = self.create_transport()
+        self.planner = WorkModePlanner(
+            hass, entry, self.set_work_mode, self.reported_work_mode
+        )
 
-    async def send_reliable_post(self, url_suffix: str, json: dict) -> ClientResponse:
-        """Make multiple attempts to post a request, doubling the delays each time."""
-        loops = 1
-        while loops <= 32:
-            response = await async_get_clientsession(self.hass).post(
-                BASE_URL + url_suffix,
-                headers=self.headers,
-                json=json,
+    def create_transport(self) -> PushTransport | None:
+        """Build the push transport chosen in the options, None to only poll."""
+        options = self.config.options
+        match options.get("push_transport", "none"):
+            case "webhook" if options.get("webhook_id"):
+                return WebhookTransport(
+                    self.hass, options["webhook_id"], self.handle_snapshot
+                )
+            case "websocket" if options.get("stream_url"):
+                return WebSocketTransport(
+                    self.hass,
+                    self.config,
+                    self.api.session,
+                    options["stream_url"],
+                    self.headers,
+                    self.handle_snapshot,
+                )
+            case "none":
+                return None
+        _LOGGER.warning("Push transport is not fully configured, only polling")
+        return None
+
+    async def send_operating_mode(
+        self, device_id: str, params: dict
+    ) -> tuple[int | None, float | None]:
+        """Make a single attempt to post a work mode, returns the status and any Retry-After."""
+        started = time.monotonic()
+        try:
+            response = await self.api.post(
+                "devices/" + device_id + "/operatingMode",
+                self.headers,
+                params,
+                REQUEST_PRIORITY_COMMAND,
             )
+        except (ClientError, TimeoutError) as err:
+            _LOGGER.info("Set workmode request failed: %s", err)
+            self.metrics.record_request(
+                "operating_mode", "error", time.monotonic() - started
+            )
+            return None, None
 
-            if response.status == 200:
-                return response
-
-            _LOGGER.info("Set workmode got status %s", response.status)
-            await asyncio.sleep(loops)
-            loops = loops * 2
-
-        return response  # return the last received response
-
-    async def set_work_mode(self, mode, data) -> None:
-        """Change the system work mode."""
-        device_id = None
-
-        # If a device is specified, find the cloud device ID from the device identifier
-        if "device_id" in data:
-            hass_device_id = data["device_id"][0]
-            dev_reg = dr.async_get(self.hass)
-            dev: DeviceEntry = dev_reg.async_get(hass_device_id)
-            for identifier in dev.identifiers:
-                device_id = identifier[1]
-
-        # If no device specified, find it in our own registry
-        if device_id is None:
-            for device in self.devices.values():
-                if device.type == "hybridinverter":
-                    device_id = device.device_id
-                    break
-
-        if device_id is None:
-            _LOGGER.warning("Cannot perform set workmode as no device determined")
-            return
-
+        self.metrics.record_request(
+            "operating_mode", response.status, response.elapsed, len(response.body)
+        )
+        return response.status, response.retry_after
+
+    def get_command_queue(self, device_id: str) -> CommandQueue:
+        """Get or create the command queue for a device."""
+        if device_id not in self.command_queues:
+            self.command_queues[device_id] = CommandQueue(
+                self.hass,
+                self.config,
+                device_id,
+                self.send_operating_mode,
+                on_retry=self.metrics.record_retry,
+                on_finish=self.record_command,
+            )
+        return self.command_queues[device_id]
+
+    def record_command(self, result: dict) -> None:
+        """Note how a command ended in the metrics and on its device's command sensors."""
+        self.metrics.record_command(result["status"], result["duration"])
+        device = self.devices.get(result["device_id"])
+        if device is not None:
+            device.record_command(result)
+
+    def check_commands(self, device: ElevenDevice) -> None:
+        """Verify any command awaiting read back against what the device just reported."""
+        queue = self.command_queues.get(device.device_id)
+        if queue is not None:
+            queue.observe(device.operating_mode)
+
+    def set_work_mode(self, mode, data, device_id: str) -> asyncio.Future | None:
+        """Queue a change of the system work mode, returns a future for the outcome."""
         workMode = None
         params = {}
 
@@ -130,38 +222,142 @@ class Controller:
                 workMode = "reset"
 
             case _:
-                _LOGGER("Unable to determine work mode from %s", mode)
-                return
+                _LOGGER.warning("Unable to determine work mode from %s", mode)
+                return None
 
         params["workMode"] = workMode
 
-        response = await self.send_reliable_post(
-            "devices/" + device_id + "/operatingMode", params
+        future = self.get_command_queue(device_id).submit(
+            params, bool(data.get("force", False))
         )
+        if not future.done():
+            # watch closely while the inverter reacts to the new mode
+            self.request_fast_polling()
+        return future
+
+    def reported_work_mode(self, device_id: str) -> str | None:
+        """The work mode a device last reported live, lower cased, None if not known yet."""
+        device = self.devices.get(device_id)
+        if device is None or device.cached_since is not None:
+            # a mode restored from the cache may be long out of date, wait for a real report
+            return None
+        entity = device.sensor_entities.get("operatingMode.workMode")
+        return entity.latestValue if entity is not None else None
+
+    def set_day_plan(self, device_id: str, data: dict) -> dict:
+        """Validate and start a device's day plan, raises ValueError if it is invalid."""
+        plan = DayPlan.from_dict(data)
+        self.planner.set_plan(device_id, plan)
+        self.cache.set_plan(device_id, plan.raw)
+        return self.planner.describe(device_id)
+
+    def clear_day_plan(self, device_id: str) -> dict:
+        """Stop following a device's day plan."""
+        self.planner.clear_plan(device_id)
+        self.cache.set_plan(device_id, None)
+        return self.planner.describe(device_id)
+
+    def restore_day_plans(self) -> None:
+        """Pick up the cached plans, they take effect once each device has reported."""
+        for device_id, raw in self.cache.plans.items():
+            if device_id not in self.devices:
+                continue
+            try:
+                self.planner.set_plan(device_id, DayPlan.from_dict(raw))
+            except (ValueError, KeyError) as err:
+                _LOGGER.warning("Ignoring cached plan for %s: %s", device_id, err)
+
+    def get_statistics(self, device_id: str, sensor_key: str | None = None) -> dict:
+        """Rolling statistics of a device, for the get_statistics service."""
+        return {
+            "device_id": device_id,
+            **self.devices[device_id].statistics(sensor_key),
+        }
 
-        if response.status != 200:
-            _LOGGER.warning(
-                "Unable to change work mode, received status %s", response.status
+    def get_snapshot(self, device_id: str) -> dict:
+        """The payload last fetched for a device from memory, for the get_device_snapshot service."""
+        device = self.devices[device_id]
+        payload, fetched = self.cache.device_payload(device_id) or (None, None)
+        sampled = sample_time(payload) if payload is not None else None
+        return {
+            "device_id": device_id,
+            "type": device.type,
+            "fetched": iso_timestamp(fetched),
+            "sampled": iso_timestamp(sampled),
+            "last_checked": iso_timestamp(device.last_poll_time),
+            "cached": device.cached_since is not None,
+            "stale": device.stale,
+            "payload": payload,
+        }
+
+    async def refresh_device(self, device_id: str) -> bool:
+        """Poll a device now, callers arriving while it is in flight share the same fetch."""
+        task = self.refreshes.get(device_id)
+        if task is None:
+            task = self.config.async_create_background_task(
+                self.hass,
+                self.poll_device(
+                    self.devices[device_id], self.refresh_semaphore, API_FRESH_SECONDS
+                ),
+                f"Eleven Energy refresh {device_id}",
             )
+            self.refreshes[device_id] = task
+            task.add_done_callback(lambda _: self.refreshes.pop(device_id, None))
+        # one caller giving up mustn't cancel the fetch for the others
+        return await asyncio.shield(task)
 
     async def initialise(self):
-        """Set up the controller."""
+        """Set up the controller, from the cache when there is one so startup needn't wait on the portal."""
         _LOGGER.info("Eleven Energy initialising")
-        await self.poll_site()
+        await self.cache.async_load()
+
+        if self.cache.site is None:
+            await self.poll_site()
+            self.restore_day_plans()
+            return
+
+        self.apply_site(self.cache.site)
+        for device in self.devices.values():
+            cached = self.cache.device_payload(device.device_id)
+            if cached is not None:
+                await device.restore(*cached)
+        self.restore_day_plans()
+        _LOGGER.info("Eleven Energy started from cached state")
+
+        # confirm the topology in the background, the first poll replaces the cached values
+        self.config.async_create_background_task(
+            self.hass, self.refresh_site(), "Eleven Energy Site"
+        )
+
+    def request_fast_polling(self):
+        """Switch to the fast poll rate and wake the poller if it is in a long sleep."""
+        self.scheduler.request_fast_polling()
+        self.poll_wakeup.set()
+
+    async def wait_for_next_poll(self):
+        """Sleep until the scheduler's deadline, which may be brought forward while waiting."""
+        while (delay := self.scheduler.time_until_next_poll()) > 0:
+            self.poll_wakeup.clear()
+            try:
+                await asyncio.wait_for(self.poll_wakeup.wait(), delay)
+            except TimeoutError:
+                pass
 
     def start_poller(self):
         """Start the async polling of inverter data."""
 
         async def periodic():
             while True:
+                await self.wait_for_next_poll()
                 _LOGGER.debug("Polling Eleven Energy")
+                success = False
                 try:
-                    await self.poll_devices()
-                except:  # noqa: E722
-                    _LOGGER.warning("Unable to poll Eleven API")
-                await asyncio.sleep(
-                    POLL_INTERVAL_SECONDS
-                )  # first because we polled it in await after init.
+                    success = await self.poll_devices()
+                except Exception as err:  # pylint: disable=broad-except
+                    _LOGGER.warning("Unable to poll Eleven API: %s", err)
+                    self.metrics.record_error(err)
+                interval = self.scheduler.schedule_next(success, self.devices.values())
+                _LOGGER.debug("Next Eleven Energy poll in %.1f seconds", interval)
 
         task = self.config.async_create_background_task(
             self.hass, periodic(), "Eleven Energy Poll"
@@ -169,26 +365,254 @@ class Controller:
 
         self.poller_task = task
 
-    async def poll_devices(self):
-        """Poll all devices for updates."""
-        for device in self.devices.values():
-            response = await async_get_clientsession(self.hass).get(
-                BASE_URL + "devices/" + device.device_id, headers=self.headers
+        async def refresh_topology():
+            while True:
+                await asyncio.sleep(TOPOLOGY_REFRESH_SECONDS)
+                await self.refresh_site()
+
+        self.topology_task = self.config.async_create_background_task(
+            self.hass, refresh_topology(), "Eleven Energy Topology"
+        )
+
+        async def watch_staleness():
+            while True:
+                await asyncio.sleep(STALE_CHECK_SECONDS)
+                for device in self.devices.values():
+                    device.check_stale(self.stale_after)
+
+        self.staleness_task = self.config.async_create_background_task(
+            self.hass, watch_staleness(), "Eleven Energy Staleness"
+        )
+
+        if self.transport is not None:
+            self.transport.start()
+
+        self.planner.start()
+
+    def is_streaming(self, device: ElevenDevice) -> bool:
+        """Determine if pushed snapshots are keeping a device current, so it needn't be polled."""
+        return (
+            device.last_push is not None
+            and time.monotonic() - device.last_push < STREAM_QUIET_SECONDS
+        )
+
+    async def handle_snapshot(self, body: bytes) -> None:
+        """Apply a device snapshot received from the push transport."""
+        try:
+            payload = json_loads(body)
+            device = self.devices.get(payload["deviceId"])
+        except (ValueError, KeyError, TypeError) as err:
+            _LOGGER.debug("Ignoring malformed Eleven Energy snapshot: %s", err)
+            return
+        if device is None:
+            _LOGGER.debug(
+                "Ignoring snapshot for unknown device %s", payload["deviceId"]
+            )
+            return
+        if not device.is_own_payload(payload):
+            # only a well formed snapshot may stand in for polling or confirm a command
+            _LOGGER.debug("Ignoring malformed snapshot for %s", device.device_id)
+            return
+
+        device.last_push = time.monotonic()
+        device.pushes = device.pushes + 1
+        self.metrics.record_push()
+        try:
+            await self.apply_body(device, body, payload)
+        except PAYLOAD_ERRORS as err:
+            _LOGGER.warning(
+                "Unable to apply snapshot for Eleven Energy device %s: %s",
+                device.device_id,
+                err,
             )
 
-            if response.status != 200:
+    async def poll_devices(self) -> bool:
+        """Poll all devices for updates concurrently, returns False only if none responded.
+
+        A device that keeps failing is left to its own poll failures, the site only
+        backs off when the portal can't be reached for any of them.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+        started = time.monotonic()
+        writes = sum(device.state_writes for device in self.devices.values())
+        # devices kept current by the push transport cost no requests
+        devices = [
+            device for device in self.devices.values() if not self.is_streaming(device)
+        ]
+        if self.scheduler.aligned:
+            # woken for one device's refresh, the rest would only return what we have
+            now = time.time()
+            devices = [device for device in devices if device.cadence.due(now)]
+        results = []
+        match self.api.breaker.state:
+            case "open":
+                # the portal is down, wait for the breaker to allow a probe
+                results = [False]
+                devices = []
+            case "half_open" if devices:
+                # probe with a single device, the rest follow only if it answers
+                results = [await self.poll_device(devices[0], semaphore)]
+                devices = devices[1:] if results[0] else []
+        results.extend(
+            await asyncio.gather(
+                *(self.poll_device(device, semaphore) for device in devices)
+            )
+        )
+        success = any(results) if results else True
+        self.metrics.record_cycle(
+            time.monotonic() - started,
+            sum(device.state_writes for device in self.devices.values()) - writes,
+            success,
+        )
+        return success
+
+    async def poll_device(
+        self, device, semaphore: asyncio.Semaphore, max_age: float = 0
+    ) -> bool:
+        """Fetch and apply the state of a single device, failures only affect this device.
+
+        A response the API fetched within max_age seconds may be used instead.
+        """
+        async with semaphore:
+            headers = self.headers
+            if device.etag is not None:
+                headers = {**self.headers, "If-None-Match": device.etag}
+            started = time.monotonic()
+            try:
+                response = await self.api.get(
+                    "devices/" + device.device_id,
+                    headers,
+                    REQUEST_PRIORITY_POLL,
+                    max_age,
+                )
+            except CircuitOpenError:
+                # the breaker has already said the portal is down, nothing was sent
+                return False
+            except (ClientError, TimeoutError) as err:
                 _LOGGER.warning(
-                    "Eleven Energy call to site API responded with %s", response.status
+                    "Unable to poll Eleven Energy device %s: %s", device.device_id, err
+                )
+                self.metrics.record_request(
+                    "device", "error", time.monotonic() - started
+                )
+                device.poll_failures = device.poll_failures + 1
+                device.publish_diagnostics()
+                return False
+            finally:
+                device.last_poll_duration = time.monotonic() - started
+
+        # whoever made the request has already counted it, a 200 only once it has applied
+        if not response.shared and response.status != 200:
+            self.metrics.record_request(
+                "device", response.status, response.elapsed, len(response.body)
+            )
+
+        if response.status == 304:
+            device.mark_fresh()
+            device.cadence.record_unchanged(time.time())
+            device.polls_not_modified = device.polls_not_modified + 1
+            device.power_change = 0.0
+            device.last_poll_time = time.time()
+            device.publish_diagnostics()
+            self.check_commands(device)
+            return True
+
+        if response.status != 200:
+            _LOGGER.warning(
+                "Eleven Energy call to device %s API responded with %s",
+                device.device_id,
+                response.status,
+            )
+            device.poll_failures = device.poll_failures + 1
+            device.publish_diagnostics()
+            return False
+
+        try:
+            await self.apply_body(device, response.body)
+        except PAYLOAD_ERRORS as err:
+            _LOGGER.warning(
+                "Unable to apply data from Eleven Energy device %s: %s",
+                device.device_id,
+                err,
+            )
+            if not response.shared:
+                self.metrics.record_request(
+                    "device", "error", response.elapsed, len(response.body)
                 )
+            device.poll_failures = device.poll_failures + 1
+            device.publish_diagnostics()
+            return False
+
+        # only a document we've applied may be confirmed by a 304 later
+        device.etag = response.headers.get("ETag")
+        if not response.shared:
+            self.metrics.record_request(
+                "device", response.status, response.elapsed, len(response.body)
+            )
+        return True
+
+    async def apply_body(self, device: ElevenDevice, body: bytes, payload=None) -> None:
+        """Apply a device document however it arrived, decoding it only if it changed.
+
+        Raises one of PAYLOAD_ERRORS if the document can't be decoded or applied,
+        the ETag and hash are then cleared so the next one is fetched and decoded
+        in full rather than taken as unchanged. The device is only marked fresh once
+        its document has been applied or confirmed unchanged.
+        """
+        seen_at = time.time()
+
+        # skip decoding and entity updates entirely if the payload is byte for byte the same
+        body_hash = hashlib.blake2b(body, digest_size=16).digest()
+        if body_hash == device.payload_hash:
+            device.last_poll_time = seen_at
+            device.mark_fresh()
+            device.cadence.record_unchanged(seen_at)
+            device.polls_unchanged = device.polls_unchanged + 1
+            device.power_change = 0.0
+            device.publish_diagnostics()
+            self.check_commands(device)
+            return
+
+        device.polls_changed = device.polls_changed + 1
+
+        try:
+            if payload is None:
+                parse_started = time.perf_counter()
+                payload = json_loads(body)
+                self.metrics.record_parse(time.perf_counter() - parse_started)
+
+            if not device.cadence.record_sample(sample_time(payload), seen_at):
+                # a sample already processed, arriving again in a different rendering,
+                # only its reported work mode is passed on to any command awaiting it
+                device.last_poll_time = seen_at
+                device.mark_fresh()
+                device.payload_hash = body_hash
+                device.operating_mode = payload.get("operatingMode")
+                self.check_commands(device)
                 return
 
-            json = await response.json()
-            await device.update(json)
+            await device.update(payload)
+        except PAYLOAD_ERRORS:
+            device.payload_hash = None
+            device.etag = None
+            raise
+
+        device.last_poll_time = seen_at
+        device.mark_fresh()
+        device.payload_hash = body_hash
+        device.publish_diagnostics()
+        self.cache.set_device_payload(device.device_id, payload, device.last_poll_time)
+
+        # confirm or chase up commands and planned transitions now the reported mode is known
+        device.operating_mode = payload.get("operatingMode")
+        self.check_commands(device)
+        self.planner.reconcile(device.device_id)
 
     async def poll_site(self):
         """Poll site for device changes."""
-        response = await async_get_clientsession(self.hass).get(
-            BASE_URL + "site", headers=self.headers
+        response = await self.api.get("site", self.headers, REQUEST_PRIORITY_TOPOLOGY)
+        self.metrics.record_request(
+            "site", response.status, response.elapsed, len(response.body)
         )
 
         if response.status != 200:
@@ -197,25 +621,89 @@ class Controller:
             )
             return
 
-        js = await response.json()
+        js = response.json()
+        self.apply_site(js)
+        self.cache.set_site(js)
+
+    async def refresh_site(self):
+        """Poll the site, logging rather than raising any failure."""
+        try:
+            await self.poll_site()
+        except Exception as err:  # pylint: disable=broad-except
+            _LOGGER.warning("Unable to refresh Eleven Energy site: %s", err)
+
+    def apply_site(self, js: dict) -> None:
+        """Create devices new to the site and remove ones that have gone."""
+        reported = set()
         for device in js["devices"]:
             device_id = device["deviceId"]
             device_type = device["type"]
-            if device_type != "hybridinverter":
+            reported.add(device_id)
+            self.topology_misses.pop(device_id, None)
+            if device_id in self.devices:
                 continue
-            if device_id not in self.devices:
-                inverter = HybridInverter(
-                    self.hass,
-                    self.config,
-                    device_id,
-                    device.get("name", "Eleven Energy"),
-                    device.get("serialNumber", ""),
-                )
-                self.devices[device_id] = inverter
-                _LOGGER.info("Created inverter %s", device_id)
 
-    def complete_platform_setup(self, platform):
-        """Mark a platform as started during init."""
+            device_class = DEVICE_TYPES.get(device_type)
+            if device_class is None:
+                if device_type not in self.unsupported_types:
+                    self.unsupported_types.add(device_type)
+                    _LOGGER.info("Ignoring unsupported device type %s", device_type)
+                continue
+
+            new_device = device_class(
+                self.hass,
+                self.config,
+                device_id,
+                device.get("name", "Eleven Energy"),
+                device.get("serialNumber", ""),
+                diagnostics=self.metrics.enabled,
+                statistics=self.config.options.get("statistics_sensors", False),
+            )
+            self.devices[device_id] = new_device
+            self.add_device_entities(new_device)
+            _LOGGER.info("Created %s %s", device_type, device_id)
+
+        # a device has to be missing from more than one refresh before we believe it's gone
+        for device_id in [d for d in self.devices if d not in reported]:
+            misses = self.topology_misses.get(device_id, 0) + 1
+            self.topology_misses[device_id] = misses
+            if misses >= TOPOLOGY_MISSES_BEFORE_REMOVAL:
+                self.remove_device(device_id)
+
+    def add_device_entities(self, device: ElevenDevice) -> None:
+        """Add a device's entities to any platform already set up, later platforms pick them up themselves."""
+        if "sensor" in self.entity_adders:
+            self.entity_adders["sensor"](list(device.sensor_entities.values()))
+        if "binary_sensor" in self.entity_adders:
+            self.entity_adders["binary_sensor"](
+                list(device.binary_sensor_entities.values())
+            )
+
+    def remove_device(self, device_id: str) -> None:
+        """Stop polling a device that has left the site and remove it from Home Assistant."""
+        self.devices.pop(device_id, None)
+        self.topology_misses.pop(device_id, None)
+        queue = self.command_queues.pop(device_id, None)
+        if queue is not None:
+            queue.cancel()
+        refresh = self.refreshes.pop(device_id, None)
+        if refresh is not None:
+            refresh.cancel()
+        self.planner.clear_plan(device_id)
+        self.cache.remove_device(device_id)
+
+        # removing the registry device also removes its entities
+        if self.hass is not None:
+            dev_reg = dr.async_get(self.hass)
+            dev = dev_reg.async_get_device(identifiers={(DOMAIN, device_id)})
+            if dev is not None:
+                dev_reg.async_remove_device(dev.id)
+        _LOGGER.info("Removed device %s as it is no longer on the site", device_id)
+
+    def complete_platform_setup(self, platform, async_add_entities=None):
+        """Mark a platform as started during init, keeping its callback for devices found later."""
+        if async_add_entities is not None:
+            self.entity_adders[platform] = async_add_entities
         self.platforms_started = self.platforms_started + 1
         if self.platforms_started == len(PLATFORMS):
             self.start_poller()
@@ -227,7 +715,23 @@ class Controller:
 
     def terminate(self):
         """End the controller."""
+        if self.transport is not None:
+            self.transport.stop()
+
+        self.planner.stop()
+
         if self.poller_task is not None:
             self.poller_task.cancel()
             self.poller_task = None
             _LOGGER.info("Eleven Energy is no longer polling")
+
+        if self.topology_task is not None:
+            self.topology_task.cancel()
+            self.topology_task = None
+
+        if self.staleness_task is not None:
+            self.staleness_task.cancel()
+            self.staleness_task = None
+
+        for queue in self.command_queues.values():
+            queue.cancel()
@@ -0,0 +1,531 @@
+"""Base class and registry for the devices found on an Eleven Energy site."""
+
+import logging
+import time
+
+from homeassistant.components.sensor import (
+    EntityCategory,
+    SensorDeviceClass,
+    SensorStateClass,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import PERCENTAGE, UnitOfEnergy, UnitOfTime
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.device_registry import DeviceInfo
+import homeassistant.util.dt as dt_util
+
+from .cadence import UpstreamCadence
+from .const import DOMAIN, STATISTICS_WINDOW_SECONDS
+from .energy import EnergyCounter, sample_time
+from .entity import InverterBinarySensorEntity, InverterSensorEntity
+from .fields import (
+    BinarySensorField,
+    EnergyField,
+    SensorField,
+    StatisticField,
+    apply_dispatch,
+    compile_dispatch,
+)
+from .timeseries import RollingSeries
+
+_LOGGER = logging.getLogger(__name__)
+
+DIAGNOSTIC_SENSOR_FIELDS: tuple[SensorField, ...] = (
+    SensorField(
+        "diagnostic",
+        "poll_latency",
+        entity_type="poll_latency",
+        icon="mdi:timer-outline",
+        unit_of_measurement=UnitOfTime.MILLISECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        decimals=0,
+        category=EntityCategory.DIAGNOSTIC,
+    ),
+    SensorField(
+        "diagnostic",
+        "last_good_sample",
+        entity_type="last_good_sample",
+        icon="mdi:clock-check-outline",
+        unit_of_measurement=None,
+        device_class=SensorDeviceClass.TIMESTAMP,
+        state_class=None,
+        category=EntityCategory.DIAGNOSTIC,
+    ),
+    SensorField(
+        "diagnostic",
+        "poll_failures",
+        entity_type="poll_failures",
+        icon="mdi:cloud-alert",
+        unit_of_measurement=None,
+        device_class=None,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        category=EntityCategory.DIAGNOSTIC,
+    ),
+    SensorField(
+        "diagnostic",
+        "state_writes",
+        entity_type="state_writes",
+        icon="mdi:database-arrow-down",
+        unit_of_measurement=None,
+        device_class=None,
+        category=EntityCategory.DIAGNOSTIC,
+    ),
+)
+
+COMMAND_SENSOR_FIELDS: tuple[SensorField, ...] = (
+    SensorField(
+        "command",
+        "latency",
+        entity_type="command_latency",
+        icon="mdi:timer-sync-outline",
+        unit_of_measurement=UnitOfTime.SECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        decimals=1,
+        category=EntityCategory.DIAGNOSTIC,
+    ),
+    SensorField(
+        "command",
+        "success_rate",
+        entity_type="command_success_rate",
+        icon="mdi:check-decagram-outline",
+        unit_of_measurement=PERCENTAGE,
+        device_class=None,
+        decimals=0,
+        category=EntityCategory.DIAGNOSTIC,
+    ),
+    SensorField(
+        "command",
+        "deduplicated",
+        entity_type="commands_deduplicated",
+        icon="mdi:content-duplicate",
+        unit_of_measurement=None,
+        device_class=None,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        category=EntityCategory.DIAGNOSTIC,
+    ),
+)
+
+
+class ElevenDevice:
+    """A device on the site, its entities are built from the class field tables.
+
+    Subclasses set type and the field tables and are registered with
+    register_device_type so the controller can create them from the site topology.
+    """
+
+    type = ""
+    sensor_fields: tuple[SensorField, ...] = ()
+    binary_sensor_fields: tuple[BinarySensorField, ...] = ()
+    energy_fields: tuple[EnergyField, ...] = ()
+    statistic_fields: tuple[StatisticField, ...] = ()
+    command_sensor_fields: tuple[SensorField, ...] = ()
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        device_id: str,
+        device_name: str,
+        device_serial_number: str,
+        diagnostics: bool = False,
+        statistics: bool = False,
+    ) -> None:
+        """Create the device, diagnostics adds sensors describing how polling is going.
+
+        statistics adds the derived rolling statistic sensors, the rolling series
+        behind them and the statistics service are always kept.
+        """
+        self.device_id = device_id
+        self.model_number = device_name
+        self.device_info = DeviceInfo(
+            identifiers={(DOMAIN, self.device_id)},
+            name="Eleven Energy " + device_name,
+            manufacturer="Eleven Energy",
+            model=self.model_number,
+            serial_number=device_serial_number,
+        )
+        self.hass = hass
+        self.entry = entry
+        self.last_poll_duration = None
+        self.last_poll_time = None
+        self.power_change = 0.0
+        self.etag = None
+        self.payload_hash = None
+        self.polls_changed = 0
+        self.polls_unchanged = 0
+        self.polls_not_modified = 0
+        self.state_writes = 0
+        self.poll_failures = 0
+        self.diagnostic_writes_mark = 0
+        self.cached_since = None
+        self.last_push = None
+        self.pushes = 0
+        self.command_outcomes: dict[str, int] = {}
+        self.operating_mode = None
+        # when the portal last told us anything about the device, cached values count from startup
+        self.last_fresh = time.monotonic()
+        self.stale = False
+        self.cadence = UpstreamCadence()
+        self.sensor_entities = {
+            field.sensor_key: InverterSensorEntity(
+                hass,
+                device_info=self.device_info,
+                device_id=self.device_id,
+                entity_type=field.entity_type,
+                icon=field.icon,
+                unit_of_measurement=field.unit_of_measurement,
+                device_class=field.device_class,
+                state_class=field.state_class,
+                decimals=field.decimals,
+                category=field.category,
+                deadband_abs=field.deadband_abs,
+                deadband_rel=field.deadband_rel,
+                min_write_interval=field.min_write_interval,
+            )
+            for field in self.sensor_fields
+        }
+        self.binary_sensor_entities = {
+            field.sensor_key: InverterBinarySensorEntity(
+                hass,
+                device_info=self.device_info,
+                device_id=self.device_id,
+                entity_type=field.entity_type,
+                icon=field.icon,
+                device_class=field.device_class,
+                category=field.category,
+            )
+            for field in self.binary_sensor_fields
+        }
+
+        # integrated from the power fields sample by sample
+        self.energy_counters = tuple(
+            (
+                field,
+                EnergyCounter(field.sign),
+                InverterSensorEntity(
+                    hass,
+                    device_info=self.device_info,
+                    device_id=self.device_id,
+                    entity_type=field.entity_type,
+                    icon=field.icon,
+                    unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+                    device_class=SensorDeviceClass.ENERGY,
+                    state_class=SensorStateClass.TOTAL_INCREASING,
+                    decimals=field.decimals,
+                ),
+            )
+            for field in self.energy_fields
+        )
+        self.sensor_entities.update(
+            {field.sensor_key: entity for field, _, entity in self.energy_counters}
+        )
+
+        # a rolling window of every numeric field, for the statistics service and sensors
+        self.series = {
+            field.sensor_key: RollingSeries()
+            for field in self.sensor_fields
+            if field.unit_of_measurement is not None
+        }
+        self.series_sources = tuple(
+            (field.hive, field.key, self.series[field.sensor_key])
+            for field in self.sensor_fields
+            if field.sensor_key in self.series
+        )
+        self.statistic_entities = ()
+        if statistics:
+            self.statistic_entities = tuple(
+                (
+                    field,
+                    self.series[field.source_key],
+                    InverterSensorEntity(
+                        hass,
+                        device_info=self.device_info,
+                        device_id=self.device_id,
+                        entity_type=field.entity_type,
+                        icon=field.icon,
+                        unit_of_measurement=field.unit_of_measurement,
+                        device_class=field.device_class,
+                        decimals=field.decimals,
+                    ),
+                )
+                for field in self.statistic_fields
+            )
+            self.sensor_entities.update(
+                {
+                    field.sensor_key: entity
+                    for field, _, entity in self.statistic_entities
+                }
+            )
+
+        # how work mode commands are going, for devices that take them
+        self.command_entities = {
+            field.key: InverterSensorEntity(
+                hass,
+                device_info=self.device_info,
+                device_id=self.device_id,
+                entity_type=field.entity_type,
+                icon=field.icon,
+                unit_of_measurement=field.unit_of_measurement,
+                device_class=field.device_class,
+                state_class=field.state_class,
+                decimals=field.decimals,
+                category=field.category,
+            )
+            for field in self.command_sensor_fields
+        }
+        self.sensor_entities.update(
+            {
+                field.sensor_key: self.command_entities[field.key]
+                for field in self.command_sensor_fields
+            }
+        )
+
+        # not fed from the payload, these describe the polling itself
+        self.diagnostic_entities = {}
+        if diagnostics:
+            self.diagnostic_entities = {
+                field.key: InverterSensorEntity(
+                    hass,
+                    device_info=self.device_info,
+                    device_id=self.device_id,
+                    entity_type=field.entity_type,
+                    icon=field.icon,
+                    unit_of_measurement=field.unit_of_measurement,
+                    device_class=field.device_class,
+                    state_class=field.state_class,
+                    decimals=field.decimals,
+                    category=field.category,
+                )
+                for field in DIAGNOSTIC_SENSOR_FIELDS
+            }
+            self.sensor_entities.update(
+                {
+                    field.sensor_key: self.diagnostic_entities[field.key]
+                    for field in DIAGNOSTIC_SENSOR_FIELDS
+                }
+            )
+
+        # everything derived from the payload, made unavailable once it is out of date
+        self.data_entities = (
+            [self.sensor_entities[field.sensor_key] for field in self.sensor_fields]
+            + list(self.binary_sensor_entities.values())
+            + [entity for _, _, entity in self.energy_counters]
+            + [entity for _, _, entity in self.statistic_entities]
+        )
+
+        # resolve every mapped field to its entity once, so updates are a direct lookup
+        self.field_dispatch = compile_dispatch(
+            [
+                (field, self.sensor_entities[field.sensor_key])
+                for field in self.sensor_fields
+            ]
+            + [
+                (field, self.binary_sensor_entities[field.sensor_key])
+                for field in self.binary_sensor_fields
+            ]
+        )
+
+    def power_value(self, sensor_key: str) -> float:
+        """Get the last known power reading for a sensor, 0 if none."""
+        value = self.sensor_entities[sensor_key].latestValue
+        if isinstance(value, (int, float)):
+            return value
+        return 0.0
+
+    def is_idle(self) -> bool:
+        """Determine if the device has nothing going on and can be polled less often."""
+        online = self.binary_sensor_entities.get("online")
+        return online is not None and not online.currentValue
+
+    def is_changing_fast(self) -> bool:
+        """Determine if the device is changing quickly enough to poll it faster."""
+        return False
+
+    def publish(self, staged) -> None:
+        """Write the state of every staged entity within the same event loop tick."""
+        for entity in staged:
+            # entities not added yet pick up their staged value when they are
+            if entity.platform is not None:
+                entity.async_write_ha_state()
+        self.state_writes = self.state_writes + len(staged)
+
+    def mark_fresh(self) -> None:
+        """Note the portal has just reported on the device, bringing stale entities back."""
+        self.last_fresh = time.monotonic()
+        if self.stale:
+            _LOGGER.info("Eleven Energy device %s is reporting again", self.device_id)
+            self.set_stale(False)
+
+    def check_stale(self, stale_after: float) -> None:
+        """Make the payload entities unavailable if nothing has arrived for stale_after seconds, 0 never."""
+        if (
+            not self.stale
+            and stale_after
+            and time.monotonic() - self.last_fresh > stale_after
+        ):
+            _LOGGER.warning(
+                "No data from Eleven Energy device %s for %.0f minutes, marking it unavailable",
+                self.device_id,
+                (time.monotonic() - self.last_fresh) / 60,
+            )
+            self.set_stale(True)
+
+    def set_stale(self, stale: bool) -> None:
+        """Switch the availability of every payload entity."""
+        self.stale = stale
+        for entity in self.data_entities:
+            entity._attr_available = not stale
+            if entity.platform is not None:
+                entity.async_write_ha_state()
+
+    def publish_diagnostics(self) -> None:
+        """Refresh the diagnostic sensors after a poll attempt."""
+        if not self.diagnostic_entities:
+            return
+
+        values = {
+            "poll_latency": round(self.last_poll_duration * 1000)
+            if self.last_poll_duration is not None
+            else None,
+            "last_good_sample": dt_util.utc_from_timestamp(self.last_poll_time)
+            if self.last_poll_time is not None
+            else None,
+            "poll_failures": self.poll_failures,
+            "state_writes": self.state_writes - self.diagnostic_writes_mark,
+        }
+        self.diagnostic_writes_mark = self.state_writes
+
+        for key, entity in self.diagnostic_entities.items():
+            value = values[key]
+            if (
+                value is not None
+                and entity.stage_value(value)
+                and entity.platform is not None
+            ):
+                entity.async_write_ha_state()
+
+    def record_command(self, result: dict) -> None:
+        """Update the command sensors with the outcome of a command sent to the portal."""
+        status = result["status"]
+        self.command_outcomes[status] = self.command_outcomes.get(status, 0) + 1
+        outcomes = self.command_outcomes
+        succeeded = outcomes.get("verified", 0) + outcomes.get("applied", 0)
+        finished = succeeded + outcomes.get("unverified", 0) + outcomes.get("failed", 0)
+
+        # superseded, cancelled and unchanged commands say nothing about the device
+        values = {
+            "success_rate": round(100 * succeeded / finished) if finished else None,
+            "deduplicated": outcomes.get("unchanged", 0),
+        }
+        if status in ("verified", "applied"):
+            values["latency"] = round(result["duration"], 1)
+
+        for key, value in values.items():
+            entity = self.command_entities.get(key)
+            if (
+                entity is not None
+                and value is not None
+                and entity.stage_value(value)
+                and entity.platform is not None
+            ):
+                entity.async_write_ha_state()
+
+    def all_entities(self) -> list:
+        """Every entity belonging to the device."""
+        return list(self.sensor_entities.values()) + list(
+            self.binary_sensor_entities.values()
+        )
+
+    def integrate_energy(self, json: dict, when: float) -> list:
+        """Add this sample to the energy counters, returns the entities that changed."""
+        staged = []
+        for field, counter, entity in self.energy_counters:
+            hive = json.get(field.hive)
+            if not isinstance(hive, dict):
+                continue
+            value = counter.add_sample(
+                when,
+                hive.get(field.key),
+                hive.get(field.anchor_key) if field.anchor_key is not None else None,
+            )
+            if value is not None and entity.stage_value(round(value, field.decimals)):
+                staged.append(entity)
+        return staged
+
+    def record_series(self, json: dict, when: float) -> list:
+        """Add this sample to the rolling series, returns the statistic entities that changed."""
+        for hive, key, series in self.series_sources:
+            inner = json if hive is None else json.get(hive)
+            if not isinstance(inner, dict):
+                continue
+            value = inner.get(key)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                series.add(when, value)
+
+        staged = []
+        for field, series, entity in self.statistic_entities:
+            value = series.statistic(field.statistic)
+            if value is not None and entity.stage_value(round(value, field.decimals)):
+                staged.append(entity)
+        return staged
+
+    def statistics(self, sensor_key: str | None = None) -> dict:
+        """Rolling statistics of one numeric field, or all of them."""
+        now = time.time()
+        return {
+            "window_seconds": STATISTICS_WINDOW_SECONDS,
+            "fields": {
+                key: series.statistics(now)
+                for key, series in self.series.items()
+                if sensor_key is None or key == sensor_key
+            },
+        }
+
+    def is_own_payload(self, json) -> bool:
+        """Determine if a pushed document has the shape of this device's portal response."""
+        if not isinstance(json, dict) or json.get("type", self.type) != self.type:
+            return False
+        if not isinstance(json.get("operatingMode", {}), dict):
+            return False
+        hives = {
+            field.hive
+            for field in self.sensor_fields
+            + self.binary_sensor_fields
+            + self.energy_fields
+            if field.hive is not None
+        }
+        return all(isinstance(json.get(hive, {}), dict) for hive in hives)
+
+    async def restore(self, payload: dict, fetched: float) -> None:
+        """Populate the entities from a cached payload, marked with when it was fetched."""
+        await self.update(payload)
+        self.cached_since = dt_util.utc_from_timestamp(fetched)
+        for entity in self.all_entities():
+            entity.set_cached_since(self.cached_since)
+
+    async def update(self, json):
+        """Update sensor values from state."""
+        # stage every change first, then write them back to back so listeners
+        # only ever see a complete snapshot of this poll
+        when = sample_time(json, time.time())
+        staged = apply_dispatch(self.field_dispatch, json)
+        staged.extend(self.integrate_energy(json, when))
+        staged.extend(self.record_series(json, when))
+
+        if self.cached_since is not None:
+            # first live sample since starting from the cache, clear the marker everywhere
+            self.cached_since = None
+            staged = self.all_entities()
+            for entity in staged:
+                entity.set_cached_since(None)
+
+        self.publish(staged)
+
+
+DEVICE_TYPES: dict[str, type[ElevenDevice]] = {}
+
+
+def register_device_type(cls: type[ElevenDevice]) -> type[ElevenDevice]:
+    """Class decorator making a device class available for its portal type."""
+    DEVICE_TYPES[cls.type] = cls
+    return cls
@@ -0,0 +1,60 @@
+"""Diagnostics support for Eleven Energy."""
+
+from __future__ import annotations
+
+import time
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+TO_REDACT = {"token", "serialNumber", "webhook_id", "stream_url"}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    controller = hass.data[DOMAIN]["controllers"][entry.entry_id]
+
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        "metrics": controller.metrics.as_dict(),
+        # shared by every site, so this reflects all of them
+        "request_budget": controller.api.budget.as_dict(),
+        "circuit_breaker": controller.api.breaker.as_dict(),
+        "shared_requests": controller.api.as_dict(),
+        "transport": controller.transport.as_dict()
+        if controller.transport is not None
+        else None,
+        "scheduler": {
+            "next_poll_in": round(controller.scheduler.time_until_next_poll(), 1),
+            "failures": controller.scheduler.failures,
+        },
+        "devices": {
+            device_id: {
+                "type": device.type,
+                "last_poll_duration": device.last_poll_duration,
+                "last_poll_time": device.last_poll_time,
+                "polls_changed": device.polls_changed,
+                "polls_unchanged": device.polls_unchanged,
+                "polls_not_modified": device.polls_not_modified,
+                "poll_failures": device.poll_failures,
+                "stale": device.stale,
+                "cadence": device.cadence.as_dict(time.time()),
+                "pushes": device.pushes,
+                "streaming": controller.is_streaming(device),
+                "plan": controller.planner.describe(device_id),
+                "command_outcomes": device.command_outcomes,
+                "state_writes": device.state_writes,
+                "suppressed_writes": sum(
+                    entity.suppressed_writes
+                    for entity in device.sensor_entities.values()
+                ),
+            }
+            for device_id, device in controller.devices.items()
+        },
+    }
@@ -0,0 +1,115 @@
+"""Incremental energy integration of power readings between portal counters."""
+
+from typing import Any
+
+import homeassistant.util.dt as dt_util
+
+from .const import ENERGY_MAX_GAP_SECONDS, ENERGY_RESYNC_KWH
+
+
+def sample_time(json: dict, default: float | None = None) -> float | None:
+    """The time a payload was sampled, from its timestamp if it has a usable one."""
+    timestamp = json.get("timestamp")
+    if isinstance(timestamp, str):
+        parsed = dt_util.parse_datetime(timestamp)
+        if parsed is not None:
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=dt_util.UTC)
+            return parsed.timestamp()
+    return default
+
+
+def positive_area(start: float, end: float, seconds: float) -> float:
+    """Area above zero of a straight line from start to end, split where it crosses zero."""
+    if start >= 0 and end >= 0:
+        return (start + end) / 2 * seconds
+    if start <= 0 and end <= 0:
+        return 0.0
+    if start > 0:
+        return start * (start / (start - end)) * seconds / 2
+    return end * (end / (end - start)) * seconds / 2
+
+
+class EnergyCounter:
+    """Integrates one direction of a power reading into kWh for the local day.
+
+    Each sample adds a trapezoid, split where the power crosses zero so that
+    each direction only counts its own side, so the cost is the same however
+    long the counter has been running. The portal's own daily counter only
+    moves once a minute, so the total is brought back to it when it resets or
+    when they differ by more than ENERGY_RESYNC_KWH. The value published only
+    ever rises within a day, as a drop would be taken for a meter reset by the
+    recorder, so when the portal is behind it is held until the portal catches
+    up. Straight after local midnight the counter is ignored until it drops
+    below the total it carried over from the day before.
+    """
+
+    def __init__(self, sign: int, max_gap: float = ENERGY_MAX_GAP_SECONDS) -> None:
+        """Initialise, sign 1 counts positive power and -1 negative power."""
+        self.sign = sign
+        self.max_gap = max_gap
+        self.day = None
+        self.last_time: float | None = None
+        self.last_power: float | None = None
+        self.anchor = 0.0
+        self.since_anchor = 0.0
+        self.last_reported: float | None = None
+        self.carried: float | None = None
+        self.value: float | None = None
+
+    def add_sample(self, when: float, power: Any, reported: Any) -> float | None:
+        """Add a power sample in kW taken at when, with the portal's daily kWh if known."""
+        if self.last_time is not None and when <= self.last_time:
+            # a sample we've already counted, e.g. the same reading polled and pushed
+            return self.value
+
+        day = dt_util.as_local(dt_util.utc_from_timestamp(when)).date()
+        if day != self.day:
+            if self.day is not None:
+                # local midnight, don't carry the last interval of yesterday over
+                self.anchor = 0.0
+                self.since_anchor = 0.0
+                self.value = 0.0
+                self.last_power = None
+                self.carried = self.last_reported
+            self.day = day
+
+        if not isinstance(power, (int, float)) or isinstance(power, bool):
+            power = None
+
+        if (
+            power is not None
+            and self.last_power is not None
+            and when - self.last_time <= self.max_gap
+        ):
+            kilowatt_seconds = positive_area(
+                self.sign * self.last_power, self.sign * power, when - self.last_time
+            )
+            self.since_anchor = self.since_anchor + kilowatt_seconds / 3600
+
+        self.last_time = when
+        self.last_power = power
+
+        if isinstance(reported, (int, float)) and not isinstance(reported, bool):
+            self.resync(float(reported))
+
+        total = self.anchor + self.since_anchor
+        self.value = total if self.value is None else max(self.value, total)
+        return self.value
+
+    def resync(self, reported: float) -> None:
+        """Follow the portal's counter when it resets or the total has drifted from it."""
+        previous, self.last_reported = self.last_reported, reported
+        if self.carried is not None:
+            if reported >= self.carried:
+                # still yesterday's total, the portal hasn't started its new day
+                return
+            self.carried = None
+        elif previous is not None and reported >= previous:
+            # only a counter that has just moved is current enough to compare with
+            if reported == previous:
+                return
+            if abs(reported - self.anchor - self.since_anchor) <= ENERGY_RESYNC_KWH:
+                return
+        self.anchor = reported
+        self.since_anchor = 0.0
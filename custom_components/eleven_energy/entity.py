@@ -0,0 +1,202 @@
+"""Entities shared by every Eleven Energy device type."""
+
+from datetime import datetime
+import time
+
+from homeassistant.components.binary_sensor import BinarySensorEntity
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorStateClass,
+)
+from homeassistant.const import UnitOfPower
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.device_registry import DeviceInfo
+from homeassistant.helpers.entity import generate_entity_id
+
+from .const import HEARTBEAT_WRITE_SECONDS
+
+
+def set_cached_since(attributes: dict, sample_time: datetime | None) -> None:
+    """Add or clear the marker showing a value came from the startup cache."""
+    if sample_time is None:
+        attributes.pop("cached_sample_time", None)
+    else:
+        attributes["cached_sample_time"] = sample_time.isoformat()
+
+
+class InverterSensorEntity(SensorEntity):
+    """The main Inverter sensor."""
+
+    _unrecorded_attributes = frozenset({"suppressed_writes", "cached_sample_time"})
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        device_info: DeviceInfo,
+        device_id: str,
+        entity_type,
+        icon,
+        unit_of_measurement=UnitOfPower.KILO_WATT,
+        device_class=SensorDeviceClass.POWER,
+        state_class=SensorStateClass.MEASUREMENT,
+        decimals=-1,
+        category=None,
+        deadband_abs=0.0,
+        deadband_rel=0.0,
+        min_write_interval=0.0,
+        heartbeat_interval=HEARTBEAT_WRITE_SECONDS,
+    ) -> None:
+        """Inverter sensor intialiser."""
+        self.currentValue = None
+        self.latestValue = None
+        self.deadband_abs = deadband_abs
+        self.deadband_rel = deadband_rel
+        self.min_write_interval = min_write_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.last_write = 0.0
+        self.suppressed_writes = 0
+        self._attr_extra_state_attributes = {"suppressed_writes": 0}
+        self._attr_device_info = device_info
+        self._attr_unique_id = device_id + "_" + entity_type
+        entity_id = generate_entity_id(
+            "sensor.{}",
+            device_id + "_" + entity_type,
+            [],
+            hass,
+        )
+        self.entity_id = entity_id
+
+        self._attr_has_entity_name = True
+
+        self._attr_translation_key: str = entity_type.lower()
+
+        self._attr_native_unit_of_measurement = unit_of_measurement
+        self._attr_native_device_class = device_class
+        self._attr_device_class = device_class
+        self._attr_state_class = state_class
+        self._attr_icon = icon
+
+        if state_class == SensorStateClass.TOTAL:
+            self._attr_last_reset = 0
+
+        if category is not None:
+            self._attr_entity_category = category
+
+        if decimals >= 0:
+            self._attr_suggested_display_precision = decimals
+
+    def within_deadband(self, new_state) -> bool:
+        """Determine if a numeric change is too small to be worth recording."""
+        if isinstance(new_state, bool) or isinstance(self.currentValue, bool):
+            return False
+        if not isinstance(new_state, (int, float)) or not isinstance(
+            self.currentValue, (int, float)
+        ):
+            return False
+
+        delta = abs(new_state - self.currentValue)
+        return delta < self.deadband_abs or delta < self.deadband_rel * abs(
+            self.currentValue
+        )
+
+    def stage_value(self, new_state) -> bool:
+        """Take a new value from the update response, returns True if the state should be written."""
+        self.latestValue = new_state
+        now = time.monotonic()
+
+        if (
+            self.currentValue is not None
+            and now - self.last_write < self.heartbeat_interval
+        ):
+            if self.currentValue == new_state:
+                # avoid noise...
+                return False
+
+            if self.within_deadband(new_state) or (
+                isinstance(new_state, (int, float))
+                and now - self.last_write < self.min_write_interval
+            ):
+                self.suppressed_writes = self.suppressed_writes + 1
+                return False
+
+        self.currentValue = new_state
+        self.last_write = now
+
+        self._attr_native_value = new_state
+        self._attr_extra_state_attributes["suppressed_writes"] = self.suppressed_writes
+        return True
+
+    def set_cached_since(self, sample_time: datetime | None) -> None:
+        """Mark the value as restored from a cached sample taken at sample_time, None clears it."""
+        set_cached_since(self._attr_extra_state_attributes, sample_time)
+
+    def set_native_value(self, new_state) -> None:
+        """Set the HA value from the update response."""
+        if self.stage_value(new_state):
+            self.async_write_ha_state()
+
+
+class InverterBinarySensorEntity(BinarySensorEntity):
+    """A binary sensor for inverter entities."""
+
+    _unrecorded_attributes = frozenset({"cached_sample_time"})
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        device_info: DeviceInfo,
+        device_id: str,
+        entity_type,
+        icon,
+        category=None,
+        device_class=None,
+    ) -> None:
+        """Init binary sensor entity."""
+        self.currentValue = None
+        self._attr_device_info = device_info
+        self.hass = hass
+        entity_id = generate_entity_id(
+            "sensor.{}",
+            device_id + "_" + entity_type,
+            [],
+            hass,
+        )
+        self.entity_id = entity_id
+        self._attr_has_entity_name = True
+
+        self._attr_translation_key: str = entity_type.lower()
+        self._attr_unique_id = device_id + "_" + entity_type
+
+        self._attr_is_on = False
+        self.currentValue = False
+        self._attr_extra_state_attributes = {}
+
+        self._attr_native_device_class = device_class
+        self._attr_device_class = device_class
+
+        self._attr_icon = icon
+
+        if category is not None:
+            self._attr_entity_category = category
+
+    def stage_value(self, new_state: bool) -> bool:
+        """Take a new value from the update response, returns True if the state should be written."""
+        newValue = new_state
+
+        if self.currentValue is not None and self.currentValue == newValue:
+            # avoid noise...
+            return False
+
+        self._attr_is_on = newValue
+        self.currentValue = newValue
+        return True
+
+    def set_cached_since(self, sample_time: datetime | None) -> None:
+        """Mark the value as restored from a cached sample taken at sample_time, None clears it."""
+        set_cached_since(self._attr_extra_state_attributes, sample_time)
+
+    def set_binary_value(self, new_state: bool) -> None:
+        """Set the HomeAssistant sensor based on inverter."""
+        if self.stage_value(new_state):
+            self._async_write_ha_state()
@@ -0,0 +1,166 @@
+"""Declarative mapping of device payload fields to entities."""
+
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+from homeassistant.components.binary_sensor import BinarySensorDeviceClass
+from homeassistant.components.sensor import (
+    EntityCategory,
+    SensorDeviceClass,
+    SensorStateClass,
+)
+from homeassistant.const import UnitOfPower
+
+
+def normalise_enum(value: Any) -> Any:
+    """Lower case string values so they match the translation state keys."""
+    if isinstance(value, str):
+        return value.lower()
+    return value
+
+
+def numeric(decimals: int = -1, scale: float = 1.0) -> Callable[[Any], Any]:
+    """Build a converter that scales and rounds numeric values, other values pass through."""
+
+    def convert(value: Any) -> Any:
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return value
+        if scale != 1.0:
+            value = value * scale
+        if decimals >= 0:
+            value = round(value, decimals)
+        return value
+
+    return convert
+
+
+@dataclass(frozen=True)
+class SensorField:
+    """Describes a sensor fed from a field in the device payload.
+
+    A hive of None means the key is at the top level of the payload.
+    """
+
+    hive: str | None
+    key: str
+    entity_type: str
+    icon: str
+    unit_of_measurement: str | None = UnitOfPower.KILO_WATT
+    device_class: SensorDeviceClass | None = SensorDeviceClass.POWER
+    state_class: SensorStateClass | None = SensorStateClass.MEASUREMENT
+    decimals: int = -1
+    category: EntityCategory | None = None
+    converter: Callable[[Any], Any] | None = None
+    deadband_abs: float = 0.0
+    deadband_rel: float = 0.0
+    min_write_interval: float = 0.0
+
+    @property
+    def sensor_key(self) -> str:
+        """The dotted hive.key name used to look up the entity."""
+        if self.hive is None:
+            return self.key
+        return self.hive + "." + self.key
+
+    def build_converter(self) -> Callable[[Any], Any]:
+        """The converter to apply to raw values, defaulting on the field type."""
+        if self.converter is not None:
+            return self.converter
+        if self.unit_of_measurement is None:
+            return normalise_enum
+        return numeric(self.decimals)
+
+
+@dataclass(frozen=True)
+class BinarySensorField:
+    """Describes a binary sensor fed from a field in the device payload."""
+
+    hive: str | None
+    key: str
+    entity_type: str
+    icon: str
+    device_class: BinarySensorDeviceClass | None = None
+    category: EntityCategory | None = None
+    converter: Callable[[Any], Any] = bool
+
+    @property
+    def sensor_key(self) -> str:
+        """The dotted hive.key name used to look up the entity."""
+        if self.hive is None:
+            return self.key
+        return self.hive + "." + self.key
+
+
+@dataclass(frozen=True)
+class EnergyField:
+    """Describes a kWh sensor integrated from a power field, one direction only.
+
+    sign 1 counts positive power and -1 negative power, anchor_key names the
+    portal's daily counter for that direction in the same hive, if it has one.
+    """
+
+    hive: str
+    key: str
+    sign: int
+    anchor_key: str | None
+    entity_type: str
+    icon: str
+    decimals: int = 3
+
+    @property
+    def sensor_key(self) -> str:
+        """Name used to look up the entity, distinct from the power field it reads."""
+        return "integrated." + self.entity_type
+
+
+@dataclass(frozen=True)
+class StatisticField:
+    """Describes a sensor showing a rolling statistic of another numeric field."""
+
+    source_key: str
+    statistic: str
+    entity_type: str
+    icon: str
+    unit_of_measurement: str | None = UnitOfPower.KILO_WATT
+    device_class: SensorDeviceClass | None = SensorDeviceClass.POWER
+    decimals: int = 2
+
+    @property
+    def sensor_key(self) -> str:
+        """Name used to look up the entity."""
+        return "statistic." + self.entity_type
+
+
+def compile_dispatch(
+    bindings: list[tuple[SensorField | BinarySensorField, Any]],
+) -> dict[str | None, tuple[tuple[str, Any, Callable[[Any], Any]], ...]]:
+    """Compile field bindings into hive -> ((key, entity, converter), ...) for fast dispatch."""
+    dispatch: dict[str | None, list] = {}
+    for field, entity in bindings:
+        dispatch.setdefault(field.hive, []).append(
+            (
+                field.key,
+                entity,
+                field.build_converter()
+                if isinstance(field, SensorField)
+                else field.converter,
+            )
+        )
+    return {hive: tuple(entries) for hive, entries in dispatch.items()}
+
+
+def apply_dispatch(dispatch, json: dict) -> list:
+    """Stage the mapped values of a payload on their entities, ignoring unmapped fields.
+
+    Returns the entities whose state needs writing, nothing is written here.
+    """
+    staged = []
+    for hive, entries in dispatch.items():
+        inner = json if hive is None else json.get(hive)
+        if not isinstance(inner, dict):
+            continue
+        for key, entity, converter in entries:
+            if key in inner and entity.stage_value(converter(inner[key])):
+                staged.append(entity)
+    return staged
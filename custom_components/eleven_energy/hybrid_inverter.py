@@ -2,364 +2,303 @@
 
 import logging
 
-from homeassistant.components.binary_sensor import (
-    BinarySensorDeviceClass,
-    BinarySensorEntity,
-)
+from homeassistant.components.binary_sensor import BinarySensorDeviceClass
 from homeassistant.components.sensor import (
     EntityCategory,
     SensorDeviceClass,
-    SensorEntity,
     SensorStateClass,
 )
-from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import (
     PERCENTAGE,
     UnitOfElectricPotential,
     UnitOfEnergy,
-    UnitOfPower,
 )
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.device_registry import DeviceInfo
-from homeassistant.helpers.entity import generate_entity_id
 
-from .const import DOMAIN
+from .const import (
+    IDLE_POWER_THRESHOLD_KW,
+    POWER_DEADBAND_KW,
+    RAPID_POWER_CHANGE_KW,
+    VOLTAGE_DEADBAND_V,
+)
+from .device import COMMAND_SENSOR_FIELDS, ElevenDevice, register_device_type
+from .fields import BinarySensorField, EnergyField, SensorField, StatisticField
 
 _LOGGER = logging.getLogger(__name__)
 
+SENSOR_FIELDS: tuple[SensorField, ...] = (
+    SensorField(
+        "pv",
+        "power",
+        entity_type="pv_power",
+        icon="mdi:solar-power",
+        decimals=2,
+        deadband_abs=POWER_DEADBAND_KW,
+    ),
+    SensorField(
+        "pv",
+        "energyToday",
+        entity_type="pv_energy_today",
+        icon="mdi:solar-power-variant",
+        unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+        device_class=SensorDeviceClass.ENERGY,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        decimals=2,
+    ),
+    SensorField(
+        "load",
+        "power",
+        entity_type="load_power",
+        icon="mdi:home-lightning-bolt",
+        decimals=2,
+        deadband_abs=POWER_DEADBAND_KW,
+    ),
+    SensorField(
+        "load",
+        "energyToday",
+        entity_type="load_energy_today",
+        icon="mdi:lightning-bolt",
+        unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+        device_class=SensorDeviceClass.ENERGY,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        decimals=2,
+    ),
+    SensorField(
+        "battery",
+        "stateOfCharge",
+        entity_type="state_of_charge",
+        icon="mdi:battery",
+        unit_of_measurement=PERCENTAGE,
+        device_class=SensorDeviceClass.BATTERY,
+        decimals=0,
+    ),
+    SensorField(
+        "battery",
+        "power",
+        entity_type="battery_power",
+        icon="mdi:battery-minus-variant",
+        decimals=2,
+        deadband_abs=POWER_DEADBAND_KW,
+    ),
+    SensorField(
+        "battery",
+        "energyInToday",
+        entity_type="battery_energy_in_today",
+        icon="mdi:battery-plus",
+        unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+        device_class=SensorDeviceClass.ENERGY,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        decimals=2,
+    ),
+    SensorField(
+        "battery",
+        "energyOutToday",
+        entity_type="battery_energy_out_today",
+        icon="mdi:battery-minus",
+        unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+        device_class=SensorDeviceClass.ENERGY,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        decimals=2,
+    ),
+    SensorField(
+        "grid",
+        "power",
+        entity_type="grid_power",
+        icon="mdi:transmission-tower",
+        decimals=2,
+        deadband_abs=POWER_DEADBAND_KW,
+    ),
+    SensorField(
+        "grid",
+        "energyInToday",
+        entity_type="grid_energy_in_today",
+        icon="mdi:transmission-tower-export",
+        unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+        device_class=SensorDeviceClass.ENERGY,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        decimals=2,
+    ),
+    SensorField(
+        "grid",
+        "energyOutToday",
+        entity_type="grid_energy_out_today",
+        icon="mdi:transmission-tower-import",
+        unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
+        device_class=SensorDeviceClass.ENERGY,
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        decimals=2,
+    ),
+    SensorField(
+        "system",
+        "power",
+        entity_type="system_power",
+        icon="mdi:flash",
+        decimals=2,
+        deadband_abs=POWER_DEADBAND_KW,
+        category=EntityCategory.DIAGNOSTIC,
+    ),
+    SensorField(
+        "system",
+        "voltage",
+        entity_type="system_voltage",
+        icon="mdi:flash",
+        unit_of_measurement=UnitOfElectricPotential.VOLT,
+        device_class=SensorDeviceClass.VOLTAGE,
+        decimals=2,
+        deadband_abs=VOLTAGE_DEADBAND_V,
+        category=EntityCategory.DIAGNOSTIC,
+    ),
+    SensorField(
+        "operatingMode",
+        "workMode",
+        entity_type="system_work_mode",
+        icon="mdi:all-inclusive-box-outline",
+        unit_of_measurement=None,
+        device_class=None,
+        state_class=None,
+    ),
+    SensorField(
+        None,
+        "status",
+        entity_type="system_status",
+        icon="mdi:check-network-outline",
+        unit_of_measurement=None,
+        device_class=None,
+        state_class=None,
+        category=EntityCategory.DIAGNOSTIC,
+    ),
+)
 
-class HybridInverter:
-    """Inverter object."""
-
-    def __init__(
-        self,
-        hass: HomeAssistant,
-        entry: ConfigEntry,
-        device_id: str,
-        device_name: str,
-        device_serial_number: str,
-    ) -> None:
-        """Create an inverter."""
-        self.type = "hybridinverter"
-        self.device_id = device_id
-        self.model_number = device_name
-        self.device_info = DeviceInfo(
-            identifiers={(DOMAIN, self.device_id)},
-            name="Eleven Energy " + device_name,
-            manufacturer="Eleven Energy",
-            model=self.model_number,
-            serial_number=device_serial_number,
-        )
-        self.hass = hass
-        self.entry = entry
-        self.sensor_entities = {
-            "pv.power": InverterSensorEntity(
-                hass,
-                device_info=self.device_info,
-                device_id=self.device_id,
-                entity_type="pv_power",
-                unit_of_measurement=UnitOfPower.KILO_WATT,
-                decimals=2,
-                icon="mdi:solar-power",
-            ),
-            "pv.energyToday": InverterSensorEntity(
-                hass,
-                device_info=self.device_info,
-                device_id=self.device_id,
-                entity_type="pv_energy_today",
-                unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
-                decimals=2,
-                icon="mdi:solar-power-variant",
-                device_class=SensorDeviceClass.ENERGY,
-                state_class=SensorStateClass.TOTAL_INCREASING,
-            ),
-            "load.power": InverterSensorEntity(
-                hass,
-                device_info=self.device_info,
-                device_id=self.device_id,
-                entity_type="load_power",
-                unit_of_measurement=UnitOfPower.KILO_WATT,
-                decimals=2,
-                icon="mdi:home-lightning-bolt",
-            ),
-            "load.energyToday": InverterSensorEntity(
-                hass,
-                device_info=self.device_info,
-                device_id=self.device_id,
-                entity_type="load_energy_today",
-                unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
-                decimals=2,
-                icon="mdi:lightning-bolt",
-                device_class=SensorDeviceClass.ENERGY,
-                state_class=SensorStateClass.TOTAL_INCREASING,
-            ),
-            "battery.stateOfCharge": InverterSensorEntity(
-                hass,
-                device_info=self.device_info,
-                device_id=self.device_id,
-                entity_type="state_of_charge",
-                unit_of_measurement=PERCENTAGE,
-                decimals=0,
-                icon="mdi:battery",
-                device_class=SensorDeviceClass.BATTERY,
-            ),
-            "battery.power": InverterSensorEntity(
-                hass,
-                device_info=self.device_info,
-                device_id=self.device_id,
-                entity_type="battery_power",
-                unit_of_measurement=UnitOfPower.KILO_WATT,
-                decimals=2,
-                icon="mdi:battery-minus-variant",
-            ),
-            "battery.energyInToday": InverterSensorEntity(
-                hass,
-                device_info=self.device_info,
-                device_id=self.device_id,
-                entity_type="battery_energy_in_today",
-                unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
-                decimals=2,
-                icon="mdi:battery-plus",
-                device_class=SensorDeviceClass.ENERGY,
-                state_class=SensorStateClass.TOTAL_INCREASING,
-            ),
-            "battery.energyOutToday": InverterSensorEntity(
-                hass,
-                device_info=self.device_info,
-                device_id=self.device_id,
-                entity_type="battery_energy_out_today",
-                unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
-                decimals=2,
-                icon="mdi:battery-minus",
-                device_class=SensorDeviceClass.ENERGY,
-                state_class=SensorStateClass.TOTAL_INCREASING,
-            ),
-            "grid.power": InverterSensorEntity(
-                hass,
-                device_info=self.device_info,
-                device_id=self.device_id,
-                entity_type="grid_power",
-                unit_of_measurement=UnitOfPower.KILO_WATT,
-                decimals=2,
-                icon="mdi:transmission-tower",
-            ),
-            "grid.energyInToday": InverterSensorEntity(
-                hass,
-                device_info=self.device_info,
-                device_id=self.device_id,
-                entity_type="grid_energy_in_today",
-                unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
-                decimals=2,
-                icon="mdi:transmission-tower-export",
-                device_class=SensorDeviceClass.ENERGY,
-                state_class=SensorStateClass.TOTAL_INCREASING,
-            ),
-            "grid.energyOutToday": InverterSensorEntity(
-                hass,
-                device_info=self.device_info,
-                device_id=self.device_id,
-                entity_type="grid_energy_out_today",
-                unit_of_measurement=UnitOfEnergy.KILO_WATT_HOUR,
-                decimals=2,
-                icon="mdi:transmission-tower-import",
-                device_class=SensorDeviceClass.ENERGY,
-                state_class=SensorStateClass.TOTAL_INCREASING,
-            ),
-            "system.power": InverterSensorEntity(
-                hass,
-                device_info=self.device_info,
-                device_id=self.device_id,
-                entity_type="system_power",
-                unit_of_measurement=UnitOfPower.KILO_WATT,
-                decimals=2,
-                icon="mdi:flash",
-                category=EntityCategory.DIAGNOSTIC,
-            ),
-            "system.voltage": InverterSensorEntity(
-                hass,
-                device_info=self.device_info,
-                device_id=self.device_id,
-                entity_type="system_voltage",
-                unit_of_measurement=UnitOfElectricPotential.VOLT,
-                device_class=SensorDeviceClass.VOLTAGE,
-                decimals=2,
-                icon="mdi:flash",
-                category=EntityCategory.DIAGNOSTIC,
-            ),
-            "operatingMode.workMode": InverterSensorEntity(
-                hass,
-                device_info=self.device_info,
-                device_id=self.device_id,
-                entity_type="system_work_mode",
-                icon="mdi:all-inclusive-box-outline",
-                device_class=None,
-                unit_of_measurement=None,
-                state_class=None,
-            ),
-            "status": InverterSensorEntity(
-                hass,
-                device_info=self.device_info,
-                device_id=self.device_id,
-                entity_type="system_status",
-                icon="mdi:check-network-outline",
-                device_class=None,
-                unit_of_measurement=None,
-                state_class=None,
-                category=EntityCategory.DIAGNOSTIC,
-            ),
-        }
-        self.binary_sensor_entities = {
-            "online": InverterBinarySensorEntity(
-                hass,
-                device_info=self.device_info,
-                device_id=self.device_id,
-                device_class=BinarySensorDeviceClass.CONNECTIVITY,
-                category=EntityCategory.DIAGNOSTIC,
-                entity_type="system_online",
-                icon="mdi:cloud-check-variant",
-            )
-        }
-
-    def processHive(self, json, hive: str):
-        """Look for useful content within a sub object in the payload and updates sensors from it."""
-        if hive not in json:
-            return
-
-        inner = json[hive]
-
-        for key in inner:
-            sensor_key = hive + "." + key
-            
-            val = inner[key]
-            if isinstance(val, str):
-                val = val.lower()
-                
-            if sensor_key in self.sensor_entities:
-                self.sensor_entities[sensor_key].set_native_value(val)
-
-    async def update(self, json):
-        """Update sensor values from state."""
-        # process useable hives from the json payload
-        self.processHive(json, "load")
-        self.processHive(json, "battery")
-        self.processHive(json, "pv")
-        self.processHive(json, "grid")
-        self.processHive(json, "system")
-        self.processHive(json, "operatingMode")
-
-        self.sensor_entities["status"].set_native_value(json["status"].lower())
-
-        self.binary_sensor_entities["online"].set_binary_value(json["online"])
-
-
-class InverterSensorEntity(SensorEntity):
-    """The main Inverter sensor."""
-
-    def __init__(
-        self,
-        hass: HomeAssistant,
-        device_info: DeviceInfo,
-        device_id: str,
-        entity_type,
-        icon,
-        unit_of_measurement=UnitOfPower.KILO_WATT,
-        device_class=SensorDeviceClass.POWER,
-        state_class=SensorStateClass.MEASUREMENT,
-        decimals=-1,
-        category=None,
-    ) -> None:
-        """Inverter sensor intialiser."""
-        self.currentValue = None
-        self._attr_device_info = device_info
-        self._attr_unique_id = device_id + "_" + entity_type
-        entity_id = generate_entity_id(
-            "sensor.{}",
-            device_id + "_" + entity_type,
-            [],
-            hass,
-        )
-        self.entity_id = entity_id
-
-        self._attr_has_entity_name = True
-
-        self._attr_translation_key: str = entity_type.lower()
-
-        self._attr_native_unit_of_measurement = unit_of_measurement
-        self._attr_native_device_class = device_class
-        self._attr_device_class = device_class
-        self._attr_state_class = state_class
-        self._attr_icon = icon
-
-        if state_class == SensorStateClass.TOTAL:
-            self._attr_last_reset = 0
-
-        if category is not None:
-            self._attr_entity_category = category
-
-        if decimals >= 0:
-            self._attr_suggested_display_precision = decimals
-
-    def set_native_value(self, new_state) -> None:
-        """Set the HA value from the update response."""
-        if self.currentValue is not None and self.currentValue == new_state:
-            # avoid noise...
-            return
-
-        self.currentValue = new_state
+BINARY_SENSOR_FIELDS: tuple[BinarySensorField, ...] = (
+    BinarySensorField(
+        None,
+        "online",
+        entity_type="system_online",
+        icon="mdi:cloud-check-variant",
+        device_class=BinarySensorDeviceClass.CONNECTIVITY,
+        category=EntityCategory.DIAGNOSTIC,
+    ),
+)
 
-        self._attr_native_value = new_state
-        self.async_write_ha_state()
 
+# battery power is negative while charging, grid power is positive while importing
+ENERGY_FIELDS: tuple[EnergyField, ...] = (
+    EnergyField(
+        "pv",
+        "power",
+        1,
+        "energyToday",
+        entity_type="pv_energy_integrated",
+        icon="mdi:solar-power-variant",
+    ),
+    EnergyField(
+        "load",
+        "power",
+        1,
+        "energyToday",
+        entity_type="load_energy_integrated",
+        icon="mdi:lightning-bolt",
+    ),
+    EnergyField(
+        "battery",
+        "power",
+        -1,
+        "energyInToday",
+        entity_type="battery_charged_integrated",
+        icon="mdi:battery-plus",
+    ),
+    EnergyField(
+        "battery",
+        "power",
+        1,
+        "energyOutToday",
+        entity_type="battery_discharged_integrated",
+        icon="mdi:battery-minus",
+    ),
+    EnergyField(
+        "grid",
+        "power",
+        1,
+        "energyInToday",
+        entity_type="grid_imported_integrated",
+        icon="mdi:transmission-tower-export",
+    ),
+    EnergyField(
+        "grid",
+        "power",
+        -1,
+        "energyOutToday",
+        entity_type="grid_exported_integrated",
+        icon="mdi:transmission-tower-import",
+    ),
+)
 
-class InverterBinarySensorEntity(BinarySensorEntity):
-    """A binary sensor for inverter entities."""
 
-    def __init__(
-        self,
-        hass: HomeAssistant,
-        device_info: DeviceInfo,
-        device_id: str,
-        entity_type,
-        icon,
-        category=None,
+STATISTIC_FIELDS: tuple[StatisticField, ...] = (
+    StatisticField(
+        "grid.power",
+        "mean",
+        entity_type="grid_power_mean",
+        icon="mdi:transmission-tower",
+    ),
+    StatisticField(
+        "pv.power",
+        "mean",
+        entity_type="pv_power_mean",
+        icon="mdi:solar-power",
+    ),
+    StatisticField(
+        "load.power",
+        "mean",
+        entity_type="load_power_mean",
+        icon="mdi:home-lightning-bolt",
+    ),
+    StatisticField(
+        "battery.stateOfCharge",
+        "slope_per_hour",
+        entity_type="state_of_charge_slope",
+        icon="mdi:battery-clock",
+        unit_of_measurement="%/h",
         device_class=None,
-    ) -> None:
-        """Init binary sensor entity."""
-        self.currentValue = None
-        self._attr_device_info = device_info
-        self.hass = hass
-        entity_id = generate_entity_id(
-            "sensor.{}",
-            device_id + "_" + entity_type,
-            [],
-            hass,
-        )
-        self.entity_id = entity_id
-        self._attr_has_entity_name = True
-
-        self._attr_translation_key: str = entity_type.lower()
-        self._attr_unique_id = device_id + "_" + entity_type
-
-        self._attr_is_on = False
-        self.currentValue = False
+        decimals=1,
+    ),
+)
 
-        self._attr_native_device_class = device_class
-        self._attr_device_class = device_class
 
-        self._attr_icon = icon
+@register_device_type
+class HybridInverter(ElevenDevice):
+    """Inverter object."""
 
-        if category is not None:
-            self._attr_entity_category = category
+    type = "hybridinverter"
+    sensor_fields = SENSOR_FIELDS
+    binary_sensor_fields = BINARY_SENSOR_FIELDS
+    energy_fields = ENERGY_FIELDS
+    statistic_fields = STATISTIC_FIELDS
+    command_sensor_fields = COMMAND_SENSOR_FIELDS
+
+    def is_idle(self) -> bool:
+        """Determine if the inverter is offline or not moving any meaningful power."""
+        if not self.binary_sensor_entities["online"].currentValue:
+            return True
+
+        return (
+            abs(self.power_value("pv.power")) < IDLE_POWER_THRESHOLD_KW
+            and abs(self.power_value("battery.power")) < IDLE_POWER_THRESHOLD_KW
+        )
 
-    def set_binary_value(self, new_state: bool) -> None:
-        """Set the HomeAssistant sensor based on inverter."""
-        newValue = new_state
+    def is_changing_fast(self) -> bool:
+        """Determine if battery or grid power swung sharply in the last sample."""
+        return self.power_change >= RAPID_POWER_CHANGE_KW
 
-        if self.currentValue is not None and self.currentValue == newValue:
-            # avoid noise...
-            return
+    async def update(self, json):
+        """Update sensor values from state."""
+        first_sample = self.sensor_entities["battery.power"].latestValue is None
+        previous_battery = self.power_value("battery.power")
+        previous_grid = self.power_value("grid.power")
 
-        self._attr_is_on = newValue
-        self.currentValue = newValue
+        await super().update(json)
 
-        self._async_write_ha_state()
+        if not first_sample:
+            self.power_change = max(
+                abs(self.power_value("battery.power") - previous_battery),
+                abs(self.power_value("grid.power") - previous_grid),
+            )
@@ -0,0 +1,133 @@
+"""Lightweight instrumentation of the controller hot paths."""
+
+from bisect import bisect_left
+import time
+
+# upper bounds in milliseconds, anything slower lands in the overflow bucket
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    """Fixed bucket histogram with a running count and sum."""
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS_MS) -> None:
+        """Create an empty histogram."""
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Add a value."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count = self.count + 1
+        self.total = self.total + value
+        self.maximum = max(self.maximum, value)
+
+    def as_dict(self) -> dict:
+        """Summarise for diagnostics."""
+        labels = [f"<={bound}" for bound in self.buckets] + [f">{self.buckets[-1]}"]
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 3) if self.count else None,
+            "max": round(self.maximum, 3),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class Metrics:
+    """Controller metrics, every record call returns immediately when disabled."""
+
+    def __init__(self, enabled: bool) -> None:
+        """Initialise the metrics."""
+        self.enabled = enabled
+        self.latency: dict[str, Histogram] = {}
+        self.status_counts: dict[str, dict[str, int]] = {}
+        self.payload_bytes: dict[str, Histogram] = {}
+        self.parse_time = Histogram((0.1, 0.5, 1, 5, 10, 50))
+        self.writes_per_cycle = Histogram((0, 5, 10, 25, 50, 100))
+        self.cycle_time = Histogram()
+        self.retries = 0
+        self.pushes = 0
+        self.command_latency = Histogram()
+        self.command_outcomes: dict[str, int] = {}
+        self.last_good_sample: float | None = None
+        self.last_error: str | None = None
+
+    def record_request(
+        self, endpoint: str, status: int | str, seconds: float, size: int = 0
+    ) -> None:
+        """Record the outcome of a portal request."""
+        if not self.enabled:
+            return
+        if endpoint not in self.latency:
+            self.latency[endpoint] = Histogram()
+            self.status_counts[endpoint] = {}
+            self.payload_bytes[endpoint] = Histogram((256, 1024, 4096, 16384, 65536))
+        self.latency[endpoint].observe(seconds * 1000)
+        counts = self.status_counts[endpoint]
+        counts[str(status)] = counts.get(str(status), 0) + 1
+        if size:
+            self.payload_bytes[endpoint].observe(size)
+
+    def record_retry(self) -> None:
+        """Record a retried command."""
+        if self.enabled:
+            self.retries = self.retries + 1
+
+    def record_command(self, status: str, seconds: float) -> None:
+        """Record how a command ended and how long it took."""
+        if not self.enabled:
+            return
+        self.command_outcomes[status] = self.command_outcomes.get(status, 0) + 1
+        if status == "verified":
+            self.command_latency.observe(seconds * 1000)
+
+    def record_push(self) -> None:
+        """Record a snapshot received from a push transport."""
+        if self.enabled:
+            self.pushes = self.pushes + 1
+
+    def record_parse(self, seconds: float) -> None:
+        """Record the time taken to decode a payload."""
+        if self.enabled:
+            self.parse_time.observe(seconds * 1000)
+
+    def record_cycle(self, seconds: float, writes: int, success: bool) -> None:
+        """Record a completed poll cycle."""
+        if not self.enabled:
+            return
+        self.cycle_time.observe(seconds * 1000)
+        self.writes_per_cycle.observe(writes)
+        if success:
+            self.last_good_sample = time.time()
+
+    def record_error(self, error: Exception) -> None:
+        """Remember the most recent unexpected error."""
+        if self.enabled:
+            self.last_error = repr(error)
+
+    def as_dict(self) -> dict:
+        """Everything recorded, for the diagnostics download."""
+        if not self.enabled:
+            return {"enabled": False}
+        return {
+            "enabled": True,
+            "latency_ms": {name: h.as_dict() for name, h in self.latency.items()},
+            "status_counts": self.status_counts,
+            "payload_bytes": {
+                name: h.as_dict() for name, h in self.payload_bytes.items()
+            },
+            "parse_time_ms": self.parse_time.as_dict(),
+            "cycle_time_ms": self.cycle_time.as_dict(),
+            "writes_per_cycle": self.writes_per_cycle.as_dict(),
+            "retries": self.retries,
+            "pushes": self.pushes,
+            "command_latency_ms": self.command_latency.as_dict(),
+            "command_outcomes": self.command_outcomes,
+            "last_good_sample_age": round(time.time() - self.last_good_sample, 1)
+            if self.last_good_sample is not None
+            else None,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,278 @@
+"""Daily work mode plans applied by the integration itself."""
+
+import asyncio
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import datetime, time, timedelta
+import logging
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+import homeassistant.util.dt as dt_util
+
+from .const import PLAN_RETRY_SECONDS, PLAN_WORK_MODES
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def parse_time(value) -> time:
+    """Accept HH:MM or HH:MM:SS, or a time already parsed by a selector."""
+    if isinstance(value, time):
+        return value
+    parsed = dt_util.parse_time(str(value))
+    if parsed is None:
+        raise ValueError(f"Invalid time {value}")
+    return parsed
+
+
+@dataclass(frozen=True)
+class PlanEntry:
+    """A work mode and its service parameters, e.g. force_charge with target_percent."""
+
+    mode: str
+    data: tuple = ()
+
+    @classmethod
+    def from_dict(cls, raw: dict) -> "PlanEntry":
+        """Build from service data, everything besides mode, start and end is a parameter."""
+        mode = raw.get("mode")
+        if mode not in PLAN_WORK_MODES:
+            raise ValueError(f"Unknown work mode {mode}")
+        params = {
+            key: value
+            for key, value in raw.items()
+            if key not in ("mode", "start", "end")
+        }
+        return cls(mode, tuple(sorted(params.items())))
+
+    @property
+    def work_mode(self) -> str:
+        """The work mode the portal reports once this entry has been applied."""
+        return PLAN_WORK_MODES[self.mode]
+
+
+@dataclass(frozen=True)
+class PlanWindow:
+    """A daily window in local time, it wraps past midnight if end is before start."""
+
+    start: time
+    end: time
+    entry: PlanEntry
+
+    def contains(self, moment: time) -> bool:
+        """Determine if a local time of day falls within the window."""
+        if self.start <= self.end:
+            return self.start <= moment < self.end
+        return moment >= self.start or moment < self.end
+
+
+@dataclass
+class DayPlan:
+    """Windows of work modes repeated every day, with a mode for the time between them."""
+
+    windows: tuple[PlanWindow, ...]
+    default: PlanEntry
+    raw: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, raw: dict) -> "DayPlan":
+        """Build and validate a plan from service data or the cache."""
+        windows = tuple(
+            PlanWindow(
+                parse_time(window["start"]),
+                parse_time(window["end"]),
+                PlanEntry.from_dict(window),
+            )
+            for window in raw.get("windows", [])
+        )
+        for window in windows:
+            if window.start == window.end:
+                raise ValueError(f"Window at {window.start} has no length")
+        default = PlanEntry.from_dict({"mode": raw.get("default", "self_consumption")})
+        # keep a JSON safe copy so the plan can be cached and restored
+        stored = {
+            "windows": [
+                {**window, "start": str(parsed.start), "end": str(parsed.end)}
+                for window, parsed in zip(raw.get("windows", []), windows)
+            ],
+            "default": default.mode,
+        }
+        return cls(windows, default, stored)
+
+    def entry_at(self, moment: datetime) -> PlanEntry:
+        """The entry in force at a local time, the first matching window wins."""
+        time_of_day = moment.time()
+        for window in self.windows:
+            if window.contains(time_of_day):
+                return window.entry
+        return self.default
+
+    def next_boundary(self, after: datetime) -> datetime:
+        """The next time a window starts or ends."""
+        candidates = []
+        for window in self.windows:
+            for boundary in (window.start, window.end):
+                when = datetime.combine(after.date(), boundary, after.tzinfo)
+                if when <= after:
+                    when = datetime.combine(
+                        after.date() + timedelta(days=1), boundary, after.tzinfo
+                    )
+                candidates.append(when)
+        if not candidates:
+            return after + timedelta(days=1)
+        return min(candidates)
+
+
+class WorkModePlanner:
+    """Applies each device's day plan, sending a command only when the plan changes mode.
+
+    The command queue confirms each transition against the reported work mode.
+    If something changes the mode later the entry is sent again. Entries are
+    plain work mode commands so sending one twice is harmless.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        submit: Callable[[str, dict, str], asyncio.Future | None],
+        reported: Callable[[str], str | None],
+    ) -> None:
+        """Initialise, submit queues a work mode and reported reads a device's current mode."""
+        self.hass = hass
+        self.entry = entry
+        self.submit = submit
+        self.reported = reported
+        self.plans: dict[str, DayPlan] = {}
+        self.applied: dict[str, PlanEntry] = {}
+        self.in_flight: dict[str, asyncio.Future] = {}
+        self.last_attempt: dict[str, float] = {}
+        self.transitions_sent = 0
+        self.transitions_skipped = 0
+        self.wakeup = asyncio.Event()
+        self.task = None
+
+    def set_plan(self, device_id: str, plan: DayPlan) -> None:
+        """Replace a device's plan and apply whatever it asks for now."""
+        self.plans[device_id] = plan
+        self.applied.pop(device_id, None)
+        self.last_attempt.pop(device_id, None)
+        self.reconcile(device_id)
+        self.wakeup.set()
+
+    def clear_plan(self, device_id: str) -> None:
+        """Stop planning a device, its current mode is left as it is."""
+        self.plans.pop(device_id, None)
+        self.applied.pop(device_id, None)
+        self.in_flight.pop(device_id, None)
+        self.last_attempt.pop(device_id, None)
+        self.wakeup.set()
+
+    def reconcile(self, device_id: str) -> None:
+        """Compare the plan with the device and send the planned entry if they differ."""
+        plan = self.plans.get(device_id)
+        if plan is None:
+            return
+        future = self.in_flight.get(device_id)
+        if future is not None and not future.done():
+            return
+
+        desired = plan.entry_at(dt_util.now())
+        reported = self.reported(device_id)
+        if reported is None:
+            # wait for a sample so we know what the device is doing
+            return
+        matches = reported == desired.work_mode.lower()
+
+        if self.applied.get(device_id) == desired:
+            if matches:
+                return
+            # applied but not what the device reports, give it a few polls before resending
+            since = self.hass.loop.time() - self.last_attempt.get(device_id, 0.0)
+            if since < PLAN_RETRY_SECONDS:
+                return
+            _LOGGER.info(
+                "Device %s reports %s rather than planned %s, re-applying",
+                device_id,
+                reported,
+                desired.work_mode,
+            )
+        elif matches and not desired.data:
+            # already in the planned mode and there's nothing to set
+            self.applied[device_id] = desired
+            self.transitions_skipped = self.transitions_skipped + 1
+            return
+
+        self.send(device_id, desired)
+
+    def send(self, device_id: str, desired: PlanEntry) -> None:
+        """Queue the planned entry and remember it once the portal accepts it."""
+        future = self.submit(
+            "set_work_mode_" + desired.mode, dict(desired.data), device_id
+        )
+        if future is None:
+            return
+        self.transitions_sent = self.transitions_sent + 1
+        self.last_attempt[device_id] = self.hass.loop.time()
+        self.in_flight[device_id] = future
+
+        def done(future: asyncio.Future) -> None:
+            if future.cancelled():
+                return
+            result = future.result()
+            if result["status"] in ("verified", "applied", "unchanged"):
+                self.applied[device_id] = desired
+            else:
+                # try again from the next reconcile
+                self.applied.pop(device_id, None)
+                self.last_attempt.pop(device_id, None)
+
+        future.add_done_callback(done)
+
+    def start(self) -> None:
+        """Start applying plans at their boundaries."""
+        self.task = self.entry.async_create_background_task(
+            self.hass, self.run(), "Eleven Energy Planner"
+        )
+
+    async def run(self) -> None:
+        """Sleep until the next window boundary of any plan, then reconcile every device."""
+        while True:
+            now = dt_util.now()
+            # wake at least every retry interval so unconfirmed transitions get resent
+            delay = min(
+                [
+                    (plan.next_boundary(now) - now).total_seconds()
+                    for plan in self.plans.values()
+                ]
+                + [PLAN_RETRY_SECONDS]
+            )
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), max(0.0, delay))
+            except TimeoutError:
+                pass
+            for device_id in list(self.plans):
+                self.reconcile(device_id)
+
+    def stop(self) -> None:
+        """Stop applying plans."""
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def describe(self, device_id: str) -> dict:
+        """The plan state of a device, for service responses and diagnostics."""
+        plan = self.plans.get(device_id)
+        if plan is None:
+            return {"device_id": device_id, "planned": False}
+        now = dt_util.now()
+        applied = self.applied.get(device_id)
+        return {
+            "device_id": device_id,
+            "planned": True,
+            "windows": len(plan.windows),
+            "current": plan.entry_at(now).mode,
+            "applied": applied.mode if applied is not None else None,
+            "next_transition": plan.next_boundary(now).isoformat(),
+        }
@@ -0,0 +1,133 @@
+"""Adaptive poll scheduling for the Eleven Energy controller."""
+
+import logging
+import random
+import time
+
+from .const import (
+    ERROR_BACKOFF_MAX_SECONDS,
+    FAST_POLL_INTERVAL_SECONDS,
+    FAST_POLL_WINDOW_SECONDS,
+    IDLE_POLL_INTERVAL_SECONDS,
+    PHASE_MIN_DELAY_SECONDS,
+    POLL_INTERVAL_SECONDS,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class PollScheduler:
+    """Decides when the next poll is due.
+
+    Deadlines are absolute monotonic times, each one is derived from the previous
+    deadline rather than from when the last poll finished so the cadence does not
+    drift by the time a poll takes. Once the portal's own refresh cadence has been
+    learnt for a device the deadline is brought forward to just after its next
+    expected refresh, it is never pushed later.
+    """
+
+    def __init__(
+        self,
+        interval: float = POLL_INTERVAL_SECONDS,
+        fast_interval: float = FAST_POLL_INTERVAL_SECONDS,
+        idle_interval: float = IDLE_POLL_INTERVAL_SECONDS,
+        fast_window: float = FAST_POLL_WINDOW_SECONDS,
+        max_backoff: float = ERROR_BACKOFF_MAX_SECONDS,
+    ) -> None:
+        """Initialise the scheduler."""
+        self.interval = interval
+        self.fast_interval = fast_interval
+        self.idle_interval = idle_interval
+        self.fast_window = fast_window
+        self.max_backoff = max_backoff
+        self.next_deadline = None
+        self.fast_until = 0.0
+        self.failures = 0
+        self.aligned = False
+
+    def request_fast_polling(self, duration: float | None = None) -> None:
+        """Poll at the fast rate for a while, e.g. after a work mode change."""
+        now = time.monotonic()
+        self.fast_until = max(
+            self.fast_until,
+            now + (duration if duration is not None else self.fast_window),
+        )
+        if self.next_deadline is not None:
+            self.next_deadline = min(self.next_deadline, now + self.fast_interval)
+        self.aligned = False
+
+    def select_interval(self, devices) -> float:
+        """Pick the polling interval based on what the devices are doing."""
+        if time.monotonic() < self.fast_until:
+            return self.fast_interval
+
+        devices = list(devices)
+        if any(device.is_changing_fast() for device in devices):
+            return self.fast_interval
+
+        if devices and all(device.is_idle() for device in devices):
+            return self.idle_interval
+
+        return self.interval
+
+    def schedule_next(self, success: bool, devices) -> float:
+        """Record the outcome of a poll and set the next deadline, returns the chosen interval."""
+        now = time.monotonic()
+        self.aligned = False
+
+        if not success:
+            self.failures = self.failures + 1
+            backoff = min(
+                self.max_backoff, self.fast_interval * (2 ** min(self.failures, 16))
+            )
+            # full jitter in the upper half of the window spreads retries out
+            delay = random.uniform(backoff / 2, backoff)
+            self.next_deadline = now + delay
+            _LOGGER.debug(
+                "Poll failed %s times, backing off %.1f seconds", self.failures, delay
+            )
+            return delay
+
+        self.failures = 0
+        devices = list(devices)
+        interval = self.select_interval(devices)
+
+        if self.next_deadline is None:
+            self.next_deadline = now + interval
+        else:
+            self.next_deadline = self.next_deadline + interval
+            if self.next_deadline < now:
+                # we overran (e.g. a slow poll or a suspended host), don't try to catch up
+                self.next_deadline = now
+
+        if interval != self.fast_interval:
+            aligned = self.align(devices, interval)
+            if aligned is not None and aligned < self.next_deadline:
+                self.next_deadline = aligned
+                self.aligned = True
+                return aligned - now
+
+        return interval
+
+    def align(self, devices, interval: float) -> float | None:
+        """The deadline just after the soonest expected portal refresh, None if no device has a known cadence."""
+        wall = time.time()
+        soonest = None
+        for device in devices:
+            period = device.cadence.period
+            if period is None:
+                continue
+            # with a slower interval than the portal, skip refreshes rather than poll more often
+            fetch = device.cadence.next_fetch(wall, wall + max(0.0, interval - period))
+            if fetch is not None and (soonest is None or fetch < soonest):
+                soonest = fetch
+        if soonest is None:
+            return None
+        now = time.monotonic()
+        return max(now + PHASE_MIN_DELAY_SECONDS, now + soonest - wall)
+
+    def time_until_next_poll(self) -> float:
+        """Seconds until the next poll is due."""
+        if self.next_deadline is None:
+            return 0.0
+        return self.next_deadline - time.monotonic()
@@ -0,0 +1,133 @@
+"""Resolution of service call targets to portal device IDs."""
+
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.helpers import device_registry as dr, entity_registry as er
+from homeassistant.helpers.device_registry import DeviceEntry
+from homeassistant.helpers.entity_registry import RegistryEntry
+
+from .const import DOMAIN
+
+
+def as_list(value) -> list[str]:
+    """A target field as a list, it may be missing, a single ID or a list."""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return list(value)
+
+
+class TargetIndex:
+    """Maps Home Assistant device, entity and area targets to portal device IDs.
+
+    Built once from the registries and then kept current from their update
+    events, so a service call is resolved with dictionary lookups rather than
+    a walk of the registries. Only Eleven Energy devices and entities are kept.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialise an empty index."""
+        self.hass = hass
+        self.portal_ids: dict[str, str] = {}
+        self.device_areas: dict[str, str | None] = {}
+        self.entity_devices: dict[str, str] = {}
+        self.entity_areas: dict[str, str] = {}
+
+    @callback
+    def start(self) -> None:
+        """Index the registries and follow their changes."""
+        for device in dr.async_get(self.hass).devices.values():
+            self.index_device(device.id, device)
+        for entry in er.async_get(self.hass).entities.values():
+            self.index_entity(entry.entity_id, entry)
+        self.hass.bus.async_listen(
+            dr.EVENT_DEVICE_REGISTRY_UPDATED, self.handle_device_event
+        )
+        self.hass.bus.async_listen(
+            er.EVENT_ENTITY_REGISTRY_UPDATED, self.handle_entity_event
+        )
+
+    def index_device(self, device_id: str, device: DeviceEntry | None) -> None:
+        """Add, update or with None remove a device."""
+        self.portal_ids.pop(device_id, None)
+        self.device_areas.pop(device_id, None)
+        if device is None:
+            return
+        for domain, identifier in device.identifiers:
+            if domain == DOMAIN:
+                self.portal_ids[device_id] = identifier
+                self.device_areas[device_id] = device.area_id
+
+    def index_entity(self, entity_id: str, entry: RegistryEntry | None) -> None:
+        """Add, update or with None remove an entity."""
+        self.entity_devices.pop(entity_id, None)
+        self.entity_areas.pop(entity_id, None)
+        if entry is None or entry.platform != DOMAIN or entry.device_id is None:
+            return
+        self.entity_devices[entity_id] = entry.device_id
+        if entry.area_id is not None:
+            self.entity_areas[entity_id] = entry.area_id
+
+    @callback
+    def handle_device_event(self, event: Event) -> None:
+        """Follow a device being created, updated or removed."""
+        device_id = event.data["device_id"]
+        device = None
+        if event.data["action"] != "remove":
+            device = dr.async_get(self.hass).async_get(device_id)
+        self.index_device(device_id, device)
+
+    @callback
+    def handle_entity_event(self, event: Event) -> None:
+        """Follow an entity being created, updated, renamed or removed."""
+        if "old_entity_id" in event.data:
+            self.index_entity(event.data["old_entity_id"], None)
+        entity_id = event.data["entity_id"]
+        entry = None
+        if event.data["action"] != "remove":
+            entry = er.async_get(self.hass).async_get(entity_id)
+        self.index_entity(entity_id, entry)
+
+    def resolve(self, data) -> list[str]:
+        """Portal device IDs for the device, entity and area targets of a call, in order without repeats."""
+        devices = as_list(data.get("device_id"))
+        devices.extend(
+            self.entity_devices[entity_id]
+            for entity_id in as_list(data.get("entity_id"))
+            if entity_id in self.entity_devices
+        )
+        for area_id in as_list(data.get("area_id")):
+            # a device in the area, or an entity placed there itself
+            devices.extend(
+                device_id
+                for device_id, area in self.device_areas.items()
+                if area == area_id
+            )
+            devices.extend(
+                self.entity_devices[entity_id]
+                for entity_id, area in self.entity_areas.items()
+                if area == area_id
+            )
+        return list(
+            dict.fromkeys(
+                self.portal_ids[device_id]
+                for device_id in devices
+                if device_id in self.portal_ids
+            )
+        )
+
+
+def has_targets(data) -> bool:
+    """Determine if a service call names any targets at all."""
+    return any(data.get(key) for key in ("device_id", "entity_id", "area_id"))
+
+
+@callback
+def async_get_target_index(hass: HomeAssistant) -> TargetIndex:
+    """Get the integration wide target index, building it on first use."""
+    hass.data.setdefault(DOMAIN, {})
+    if "targets" not in hass.data[DOMAIN]:
+        index = TargetIndex(hass)
+        index.start()
+        hass.data[DOMAIN]["targets"] = index
+    return hass.data[DOMAIN]["targets"]
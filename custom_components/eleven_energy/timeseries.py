@@ -0,0 +1,188 @@
+"""Rolling statistics over recent samples, kept in fixed size arrays."""
+
+from array import array
+from bisect import bisect_left, insort
+from collections import deque
+
+from .const import STATISTICS_CAPACITY, STATISTICS_WINDOW_SECONDS
+
+
+class RollingSeries:
+    """The samples of one field within a trailing time window.
+
+    Samples live in a pair of preallocated ring buffers. The sums needed for the
+    mean and least squares slope are updated as samples arrive and leave, and
+    min and max come from monotonic queues, all in constant amortised time.
+    Percentiles come from a sorted copy of the values. Each sample is placed in
+    it and later removed by binary search, but the list shift behind each of
+    those is linear in the samples held, a memmove of at most capacity floats.
+    Nothing is rescanned to answer a query. The sums are rebuilt from a fresh
+    time origin once per capacity samples to stop float error accumulating.
+    """
+
+    def __init__(
+        self,
+        window: float = STATISTICS_WINDOW_SECONDS,
+        capacity: int = STATISTICS_CAPACITY,
+    ) -> None:
+        """Create an empty series holding at most capacity samples from the last window seconds."""
+        self.window = window
+        self.capacity = capacity
+        self.times = array("d", [0.0]) * capacity
+        self.values = array("d", [0.0]) * capacity
+        self.start = 0
+        self.count = 0
+        self.added = 0
+        self.origin = 0.0
+        self.sum_t = 0.0
+        self.sum_tt = 0.0
+        self.sum_v = 0.0
+        self.sum_tv = 0.0
+        self.minima: deque[tuple[int, float]] = deque()
+        self.maxima: deque[tuple[int, float]] = deque()
+        self.ordered: list[float] = []
+        self.since_rebase = 0
+
+    @property
+    def latest_time(self) -> float | None:
+        """Time of the newest sample."""
+        if not self.count:
+            return None
+        return self.times[(self.start + self.count - 1) % self.capacity]
+
+    def add(self, when: float, value: float) -> None:
+        """Add a sample, ignoring any not newer than the last one."""
+        if self.count and when <= self.latest_time:
+            return
+
+        self.expire(when)
+        if self.count == self.capacity:
+            self.evict()
+        if not self.count:
+            self.reset_sums(when)
+
+        index = (self.start + self.count) % self.capacity
+        self.times[index] = when
+        self.values[index] = value
+        self.count = self.count + 1
+
+        t = when - self.origin
+        self.sum_t = self.sum_t + t
+        self.sum_tt = self.sum_tt + t * t
+        self.sum_v = self.sum_v + value
+        self.sum_tv = self.sum_tv + t * value
+
+        sequence = self.added
+        self.added = self.added + 1
+        while self.minima and self.minima[-1][1] >= value:
+            self.minima.pop()
+        self.minima.append((sequence, value))
+        while self.maxima and self.maxima[-1][1] <= value:
+            self.maxima.pop()
+        self.maxima.append((sequence, value))
+        insort(self.ordered, value)
+
+        self.since_rebase = self.since_rebase + 1
+        if self.since_rebase >= self.capacity:
+            self.rebase()
+
+    def expire(self, now: float) -> None:
+        """Drop samples that have fallen out of the window."""
+        while self.count and now - self.times[self.start] > self.window:
+            self.evict()
+
+    def evict(self) -> None:
+        """Remove the oldest sample."""
+        value = self.values[self.start]
+        t = self.times[self.start] - self.origin
+        self.sum_t = self.sum_t - t
+        self.sum_tt = self.sum_tt - t * t
+        self.sum_v = self.sum_v - value
+        self.sum_tv = self.sum_tv - t * value
+
+        oldest = self.added - self.count
+        if self.minima and self.minima[0][0] == oldest:
+            self.minima.popleft()
+        if self.maxima and self.maxima[0][0] == oldest:
+            self.maxima.popleft()
+        del self.ordered[bisect_left(self.ordered, value)]
+
+        self.start = (self.start + 1) % self.capacity
+        self.count = self.count - 1
+
+    def reset_sums(self, origin: float) -> None:
+        """Zero the running sums around a new time origin."""
+        self.origin = origin
+        self.sum_t = self.sum_tt = self.sum_v = self.sum_tv = 0.0
+        self.since_rebase = 0
+
+    def rebase(self) -> None:
+        """Rebuild the running sums exactly, measured from the oldest sample."""
+        self.reset_sums(self.times[self.start])
+        for offset in range(self.count):
+            index = (self.start + offset) % self.capacity
+            t = self.times[index] - self.origin
+            value = self.values[index]
+            self.sum_t = self.sum_t + t
+            self.sum_tt = self.sum_tt + t * t
+            self.sum_v = self.sum_v + value
+            self.sum_tv = self.sum_tv + t * value
+
+    def percentile(self, pct: float) -> float | None:
+        """Nearest rank percentile."""
+        if not self.ordered:
+            return None
+        rank = min(
+            len(self.ordered) - 1, max(0, round(pct / 100 * len(self.ordered)) - 1)
+        )
+        return self.ordered[rank]
+
+    def slope(self) -> float | None:
+        """Least squares slope in units per second, None without two distinct times."""
+        denominator = self.count * self.sum_tt - self.sum_t * self.sum_t
+        if self.count < 2 or denominator <= 0:
+            return None
+        return (self.count * self.sum_tv - self.sum_t * self.sum_v) / denominator
+
+    def mean(self) -> float | None:
+        """Mean of the samples in the window."""
+        if not self.count:
+            return None
+        return self.sum_v / self.count
+
+    def statistic(self, name: str) -> float | None:
+        """A single named statistic, as used by the derived sensors."""
+        match name:
+            case "mean":
+                return self.mean()
+            case "min":
+                return self.minima[0][1] if self.minima else None
+            case "max":
+                return self.maxima[0][1] if self.maxima else None
+            case "slope_per_hour":
+                slope = self.slope()
+                return slope * 3600 if slope is not None else None
+            case "p10":
+                return self.percentile(10)
+            case "p50":
+                return self.percentile(50)
+            case "p90":
+                return self.percentile(90)
+        raise ValueError(f"Unknown statistic {name}")
+
+    def statistics(self, now: float) -> dict:
+        """Every statistic for the window ending now."""
+        self.expire(now)
+        result = {
+            "count": self.count,
+            "span_seconds": round(self.latest_time - self.times[self.start], 1)
+            if self.count
+            else None,
+            "latest": self.values[(self.start + self.count - 1) % self.capacity]
+            if self.count
+            else None,
+        }
+        for name in ("mean", "min", "max", "slope_per_hour", "p10", "p50", "p90"):
+            value = self.statistic(name)
+            result[name] = round(value, 4) if value is not None else None
+        return result
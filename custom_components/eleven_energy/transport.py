@@ -0,0 +1,181 @@
+"""Push transports delivering device snapshots without polling."""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+import logging
+import random
+import time
+
+from aiohttp import ClientError, ClientSession, WSMsgType, web
+
+from homeassistant.components import webhook
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import (
+    DOMAIN,
+    STREAM_HEARTBEAT_SECONDS,
+    STREAM_RECONNECT_BASE_SECONDS,
+    STREAM_RECONNECT_MAX_SECONDS,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class PushTransport:
+    """A source of pushed device snapshots.
+
+    Every message is the JSON of a single device, the same document the portal
+    returns from devices/{id}, and is handed to on_snapshot as raw bytes.
+    """
+
+    name = ""
+
+    def __init__(self, on_snapshot: Callable[[bytes], Awaitable[None]]) -> None:
+        """Initialise the transport."""
+        self.on_snapshot = on_snapshot
+        self.messages = 0
+        self.last_message: float | None = None
+        self.connected = False
+
+    def start(self) -> None:
+        """Begin receiving snapshots."""
+
+    def stop(self) -> None:
+        """Stop receiving snapshots."""
+
+    async def deliver(self, body: bytes) -> None:
+        """Pass a received snapshot on."""
+        self.messages = self.messages + 1
+        self.last_message = time.monotonic()
+        await self.on_snapshot(body)
+
+    def as_dict(self) -> dict:
+        """Summarise for diagnostics."""
+        return {
+            "name": self.name,
+            "connected": self.connected,
+            "messages": self.messages,
+            "last_message_age": round(time.monotonic() - self.last_message, 1)
+            if self.last_message is not None
+            else None,
+        }
+
+
+class WebhookTransport(PushTransport):
+    """Snapshots POSTed to a Home Assistant webhook, from the local network only."""
+
+    name = "webhook"
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        webhook_id: str,
+        on_snapshot: Callable[[bytes], Awaitable[None]],
+    ) -> None:
+        """Initialise the transport for a webhook ID."""
+        super().__init__(on_snapshot)
+        self.hass = hass
+        self.webhook_id = webhook_id
+
+    def start(self) -> None:
+        """Register the webhook."""
+        webhook.async_register(
+            self.hass,
+            DOMAIN,
+            "Eleven Energy",
+            self.webhook_id,
+            self.handle_webhook,
+            allowed_methods=["POST"],
+            local_only=True,
+        )
+        self.connected = True
+        _LOGGER.info(
+            "Eleven Energy accepting snapshots at %s",
+            webhook.async_generate_path(self.webhook_id),
+        )
+
+    def stop(self) -> None:
+        """Unregister the webhook."""
+        if self.connected:
+            webhook.async_unregister(self.hass, self.webhook_id)
+            self.connected = False
+
+    async def handle_webhook(
+        self, hass: HomeAssistant, webhook_id: str, request: web.Request
+    ) -> web.Response:
+        """Take a snapshot from the request body."""
+        await self.deliver(await request.read())
+        return web.Response(status=200)
+
+
+class WebSocketTransport(PushTransport):
+    """Snapshots streamed over a websocket, reconnecting with backoff when it drops."""
+
+    name = "websocket"
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        session: ClientSession,
+        url: str,
+        headers: dict[str, str],
+        on_snapshot: Callable[[bytes], Awaitable[None]],
+    ) -> None:
+        """Initialise the transport for a stream URL."""
+        super().__init__(on_snapshot)
+        self.hass = hass
+        self.entry = entry
+        self.session = session
+        self.url = url
+        self.headers = headers
+        self.failures = 0
+        self.task = None
+
+    def start(self) -> None:
+        """Connect in the background."""
+        self.task = self.entry.async_create_background_task(
+            self.hass, self.run(), "Eleven Energy Stream"
+        )
+
+    def stop(self) -> None:
+        """Disconnect."""
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        self.connected = False
+
+    async def run(self) -> None:
+        """Receive snapshots for as long as the stream stays up, then reconnect."""
+        while True:
+            try:
+                # the shared session has a socket read timeout, pinging well within
+                # it keeps a quiet stream from being mistaken for a dead one
+                async with self.session.ws_connect(
+                    self.url, headers=self.headers, heartbeat=STREAM_HEARTBEAT_SECONDS
+                ) as ws:
+                    self.connected = True
+                    self.failures = 0
+                    _LOGGER.info("Eleven Energy stream connected")
+                    async for msg in ws:
+                        if msg.type == WSMsgType.TEXT:
+                            await self.deliver(msg.data.encode())
+                        elif msg.type == WSMsgType.BINARY:
+                            await self.deliver(msg.data)
+                        elif msg.type == WSMsgType.ERROR:
+                            break
+            except (ClientError, TimeoutError) as err:
+                _LOGGER.info("Eleven Energy stream failed: %s", err)
+            finally:
+                self.connected = False
+
+            # polling covers the devices while we're away
+            self.failures = self.failures + 1
+            ceiling = min(
+                STREAM_RECONNECT_MAX_SECONDS,
+                STREAM_RECONNECT_BASE_SECONDS * (2 ** min(self.failures, 16)),
+            )
+            delay = random.uniform(ceiling / 2, ceiling)
+            _LOGGER.debug("Reconnecting Eleven Energy stream in %.1f seconds", delay)
+            await asyncio.sleep(delay)
@@ -0,0 +1,94 @@
+"""Tests for polling in the controller, run against the mock portal."""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+import tempfile
+import time
+
+from homeassistant.core import HomeAssistant
+
+from benchmarks.mock_portal import MockPortal, PortalConfig
+from benchmarks.run_benchmarks import BenchEntry
+from custom_components.eleven_energy.api import ElevenEnergyApi
+from custom_components.eleven_energy.controller import Controller
+
+MALFORMED = b"<html><body>Service temporarily unavailable</body></html>"
+
+
+def run_site(
+    scenario: Callable[[Controller, MockPortal], Awaitable[None]], devices: int = 2
+) -> None:
+    """Run a scenario against a controller for a mock site with no entities registered."""
+
+    async def main() -> None:
+        portal = MockPortal(PortalConfig(devices=devices, latency=0.0))
+        api = ElevenEnergyApi(await portal.start())
+        with tempfile.TemporaryDirectory() as config_dir:
+            hass = HomeAssistant(config_dir)
+            controller = Controller("test", hass, BenchEntry({}), api)
+            try:
+                await controller.initialise()
+                await scenario(controller, portal)
+            finally:
+                controller.terminate()
+                await api.close()
+                await portal.stop()
+                await hass.async_stop(force=True)
+
+    asyncio.run(main())
+
+
+def test_malformed_device_does_not_fail_the_cycle():
+    """One device answering 200 with a body that isn't JSON leaves the other updating."""
+
+    async def scenario(controller: Controller, portal: MockPortal) -> None:
+        portal.devices["device-0"].render = lambda: MALFORMED
+        good = controller.devices["device-1"]
+
+        assert await controller.poll_devices()
+        assert controller.devices["device-0"].poll_failures == 1
+        assert good.poll_failures == 0
+        assert good.polls_changed == 1
+        assert good.sensor_entities["pv.power"].currentValue is not None
+
+    run_site(scenario)
+
+
+def test_malformed_body_is_never_taken_as_unchanged():
+    """The same broken body, or a 304 for it, keeps failing rather than counting as unchanged."""
+
+    async def scenario(controller: Controller, portal: MockPortal) -> None:
+        portal.devices["device-0"].render = lambda: MALFORMED
+        broken = controller.devices["device-0"]
+
+        for cycle in range(1, 4):
+            await controller.poll_devices()
+            assert broken.poll_failures == cycle
+            assert broken.etag is None
+            assert broken.payload_hash is None
+        assert broken.polls_unchanged == 0
+        assert broken.polls_not_modified == 0
+
+    run_site(scenario)
+
+
+def test_malformed_device_goes_stale():
+    """A device answering only with bodies that can't be applied is never marked fresh."""
+
+    async def scenario(controller: Controller, portal: MockPortal) -> None:
+        portal.devices["device-0"].render = lambda: MALFORMED
+        broken = controller.devices["device-0"]
+        good = controller.devices["device-1"]
+
+        for _ in range(3):
+            # as though the stale window had passed since either last reported
+            for device in (broken, good):
+                device.last_fresh = time.monotonic() - 2 * controller.stale_after
+            await controller.poll_devices()
+            for device in (broken, good):
+                device.check_stale(controller.stale_after)
+
+            assert broken.stale
+            assert not good.stale
+
+    run_site(scenario)
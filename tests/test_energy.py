@@ -0,0 +1,54 @@
+"""Tests for the energy counters behind the integrated energy sensors."""
+
+import homeassistant.util.dt as dt_util
+
+from custom_components.eleven_energy.const import ENERGY_RESYNC_KWH
+from custom_components.eleven_energy.energy import EnergyCounter
+
+dt_util.set_default_time_zone(dt_util.get_time_zone("Europe/London"))
+
+MORNING = dt_util.parse_datetime("2026-06-01T10:00:00+01:00").timestamp()
+
+
+def test_integrates_between_portal_ticks():
+    """A steady 3 kW adds up between the portal counter's own steps."""
+    counter = EnergyCounter(1)
+    values = [
+        counter.add_sample(MORNING + index * 10, 3.0, 1.0 + (index // 6) * 0.05)
+        for index in range(12)
+    ]
+    assert values[1] > values[0]
+    assert values[2] > values[1]
+    assert abs(values[5] - (1.0 + 5 * 10 * 3 / 3600)) < 1e-9
+
+
+def test_lower_portal_total_never_lowers_the_value():
+    """A portal total well below the integrated one mid-day holds the value until it catches up."""
+    counter = EnergyCounter(1)
+    counter.add_sample(MORNING, 3.0, 5.0)
+    values = [counter.add_sample(MORNING + 10, 3.0, 5.0)]
+    held = values[0]
+
+    # far more than the resync margin below, and below the recorder's reset threshold too
+    reported = held - 10 * ENERGY_RESYNC_KWH
+    for index in range(2, 80):
+        reported = reported + 0.05
+        values.append(counter.add_sample(MORNING + index * 10, 3.0, reported))
+
+    assert all(later >= earlier for earlier, later in zip(values, values[1:]))
+    assert values[1] == held
+    # once the portal passes the held value the sensor follows it again
+    assert values[-1] > held
+
+
+def test_resets_at_local_midnight():
+    """The new day starts from zero, ignoring yesterday's total still being reported."""
+    counter = EnergyCounter(1)
+    midnight = dt_util.parse_datetime("2026-06-02T00:00:05+01:00").timestamp()
+    counter.add_sample(midnight - 20, 3.0, 12.0)
+    counter.add_sample(midnight - 10, 3.0, 12.0)
+
+    assert counter.add_sample(midnight, 3.0, 12.0) == 0.0
+    assert counter.add_sample(midnight + 10, 3.0, 12.0) < ENERGY_RESYNC_KWH
+    # the portal has started its new day, and it is ahead of the integrated total
+    assert counter.add_sample(midnight + 20, 3.0, 0.02) == 0.02